@@ -18,6 +18,8 @@
 
     # always loaded
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/templates.xml',
         'views/res_config_settings_views.xml',
     ],
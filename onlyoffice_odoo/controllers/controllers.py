@@ -4,6 +4,7 @@
 # (c) Copyright Ascensio System SIA 2024
 #
 
+import functools
 import json
 import logging
 import markupsafe
@@ -14,15 +15,24 @@ from odoo import http
 from odoo.http import request
 
 from odoo.addons.onlyoffice_odoo.utils import file_utils
+from odoo.addons.onlyoffice_odoo.utils import format_utils
 from odoo.addons.onlyoffice_odoo.utils import jwt_utils
 from odoo.addons.onlyoffice_odoo.utils import config_utils
 from odoo.addons.onlyoffice_odoo.utils import url_utils
+from odoo.addons.onlyoffice_odoo.utils import token_utils
+from odoo.addons.onlyoffice_odoo.utils import response_utils
+from odoo.addons.onlyoffice_odoo.utils import metrics_utils
 
-from mimetypes import guess_type
-from urllib.request import urlopen
+from werkzeug.exceptions import Forbidden
 
 _logger = logging.getLogger(__name__)
 _mobile_regex = r"android|avantgo|playbook|blackberry|blazer|compal|elaine|fennec|hiptop|iemobile|ip(hone|od|ad)|iris|kindle|lge |maemo|midp|mmp|opera m(ob|in)i|palm( os)?|phone|p(ixi|re)\\/|plucker|pocket|psp|symbian|treo|up\\.(browser|link)|vodafone|wap|windows (ce|phone)|xda|xiino"
+_mobile_matcher = re.compile(_mobile_regex, re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=256)
+def is_mobile_user_agent(user_agent):
+    return bool(_mobile_matcher.search(user_agent or ""))
 
 
 class Onlyoffice_Connector(http.Controller):
@@ -57,11 +67,15 @@ class Onlyoffice_Connector(http.Controller):
 
             jwt_utils.decode_token(request.env, token)
 
-        stream = request.env["ir.binary"]._get_stream_from(attachment, "datas", None, "name", None)
+        if response_utils.is_not_modified(request.httprequest, attachment):
+            return response_utils.not_modified(request, attachment)
 
-        send_file_kwargs = {"as_attachment": True, "max_age": None}
+        settings = config_utils.get_settings(request.env)
+        response = response_utils.offload(request, attachment, settings.file_offload, settings.file_offload_prefix)
+        if response:
+            return response
 
-        return stream.get_response(**send_file_kwargs)
+        return response_utils.stream(request, attachment)
 
     @http.route("/onlyoffice/editor/<int:attachment_id>", auth="public", type="http", website=True)
     def render_editor(self, attachment_id, access_token=None):
@@ -71,16 +85,16 @@ class Onlyoffice_Connector(http.Controller):
 
         attachment.validate_access(access_token)
 
-        data = attachment.read(["id", "checksum", "public", "name", "access_token"])[0]
+        data = attachment.read(["id", "checksum", "name"])[0]
         filename = data["name"]
-        
+
         can_read = attachment.check_access_rights("read", raise_exception=False) and file_utils.can_view(filename)
         can_write = attachment.check_access_rights("write", raise_exception=False) and file_utils.can_edit(filename)
 
         if (not can_read):
             raise Exception("cant read")
 
-        return request.render("onlyoffice_odoo.onlyoffice_editor", self.prepare_editor_values(attachment, access_token, can_write))
+        return request.render("onlyoffice_odoo.onlyoffice_editor", self.prepare_editor_values(attachment, access_token, can_write, data))
 
     @http.route("/onlyoffice/editor/callback/<int:attachment_id>", auth="public", methods=["POST"], type="http", csrf=False)
     def editor_callback(self, attachment_id, oo_security_token=None, access_token=None):
@@ -90,7 +104,8 @@ class Onlyoffice_Connector(http.Controller):
         try:
             body = request.get_json_data()
 
-            attachment = self.get_attachment(attachment_id, self.get_user_from_token(oo_security_token))
+            user = self.get_user_from_token(oo_security_token)
+            attachment = self.get_attachment(attachment_id, user)
             if not attachment:
                 raise Exception("attachment not found")
 
@@ -116,7 +131,8 @@ class Onlyoffice_Connector(http.Controller):
 
             if (status == 2) | (status == 3):  # mustsave, corrupted
                 file_url = url_utils.replace_public_url_to_internal(request.env, body.get("url"))
-                attachment.write({"raw": urlopen(file_url).read(), "mimetype": guess_type(file_url)[0]})
+                # the download and the write are done by the save job queue
+                request.env["onlyoffice.save.job"].sudo()._enqueue(attachment, user, body.get("key"), file_url)
 
         except Exception as ex:
             response_json["error"] = 1
@@ -128,48 +144,96 @@ class Onlyoffice_Connector(http.Controller):
             headers=[("Content-Type", "application/json")],
         )
         
-    def prepare_editor_values(self, attachment, access_token, can_write):
-        data = attachment.read(["id", "checksum", "public", "name", "access_token"])[0]
-
-        docserver_url = config_utils.get_doc_server_public_url(request.env)
-        odoo_url = config_utils.get_base_or_odoo_url(request.env)
-
-        filename = self.filter_xss(data["name"])
-
-        security_token = jwt_utils.encode_payload(request.env, { "id": request.env.user.id }, config_utils.get_internal_jwt_secret(request.env))
-        path_part = str(data["id"]) + "?oo_security_token=" + security_token + ("&access_token=" + access_token if access_token else "")
-
-        document_type = file_utils.get_file_type(filename)
-
-        is_mobile = bool(re.search(_mobile_regex, request.httprequest.headers.get("User-Agent"), re.IGNORECASE))
-
-        root_config = {
-            "width": "100%",
-            "height": "100%",
-            "type": "mobile" if is_mobile else "desktop",
-            "documentType": document_type,
-            "document": {
-                "title": filename,
-                "url": odoo_url + "onlyoffice/file/content/" + path_part,
-                "fileType": file_utils.get_file_ext(filename),
-                "key": str(data["id"]) + str(data["checksum"]),
-                "permissions": { "edit": can_write },
-            },
-            "editorConfig": {
-                "mode": "edit" if can_write else "view",
-                "lang": request.env.user.lang,
-                "user": {"id": str(request.env.user.id), "name": request.env.user.name},
-                "customization": {},
-            },
-        }
-
-        if can_write:
-            root_config["editorConfig"]["callbackUrl"] = odoo_url + "onlyoffice/editor/callback/" + path_part
+    @http.route("/onlyoffice/metrics", auth="user", type="json")
+    def get_metrics(self):
+        if not request.env.user.has_group("base.group_system"):
+            raise Forbidden()
+
+        return metrics_utils.get_stats()
+
+    @http.route("/onlyoffice/convert", auth="user", methods=["POST"], type="json")
+    def post_convert(self, attachment_ids, format, save=False):
+        # pending conversions are reported as such, the client sends them again until they are done
+        Conversion = request.env["onlyoffice.conversion"]
+        results = []
+        for attachment_id in attachment_ids:
+            result = {"attachment_id": attachment_id}
+            try:
+                attachment = self.get_attachment(int(attachment_id))
+                if not attachment:
+                    raise Exception("attachment not found")
+
+                conversion = Conversion._request(attachment, format)
+                result.update(conversion._get_status(attachment))
+                if save and conversion.state == "done":
+                    result["result_id"] = conversion._save(attachment).id
+            except Exception as ex:
+                _logger.warning("Failed to convert attachment %s: %s", attachment_id, ex)
+                result.update({"state": "failed", "error": str(ex)})
+            results.append(result)
+
+        return {"files": results}
+
+    @http.route("/onlyoffice/convert/result/<int:conversion_id>", auth="user")
+    def get_conversion_result(self, conversion_id, attachment_id=None):
+        # the result is shared by every file with the same content, so access is checked on the source
+        if not attachment_id or not str(attachment_id).isdigit():
+            return request.not_found()
 
-        if jwt_utils.is_jwt_enabled(request.env):
-            root_config["token"] = jwt_utils.encode_payload(request.env, root_config)
+        attachment = self.get_attachment(int(attachment_id))
+        conversion = request.env["onlyoffice.conversion"].sudo().browse(conversion_id).exists()
+        if not attachment or not conversion or conversion.state != "done" or not conversion.attachment_id:
+            return request.not_found()
+        if attachment.checksum != conversion.checksum:
+            return request.not_found()
 
-        return {"docTitle": filename, "docIcon": f"/onlyoffice_odoo/static/description/editor_icons/{document_type}.ico", "docApiJS": docserver_url + "web-apps/apps/api/documents/api.js", "editorConfig": markupsafe.Markup(json.dumps(root_config))}
+        return response_utils.stream(request, conversion.attachment_id, conversion._get_result_name(attachment))
+
+    def prepare_editor_values(self, attachment, access_token, can_write, data=None):
+        with metrics_utils.timer("editor.open"):
+            if data is None:
+                data = attachment.read(["id", "checksum", "name"])[0]
+
+            settings = config_utils.get_settings(request.env)
+            user = request.env.user
+
+            filename = self.filter_xss(data["name"])
+            file_ext = file_utils.get_file_ext(filename)
+            file_format = format_utils.get_format(file_ext)
+            document_type = file_format.type if file_format else None
+
+            security_token = token_utils.issue_security_token(request.env, user.id)
+            path_part = str(data["id"]) + "?oo_security_token=" + security_token + ("&access_token=" + access_token if access_token else "")
+
+            is_mobile = is_mobile_user_agent(request.httprequest.headers.get("User-Agent"))
+
+            root_config = {
+                "width": "100%",
+                "height": "100%",
+                "type": "mobile" if is_mobile else "desktop",
+                "documentType": document_type,
+                "document": {
+                    "title": filename,
+                    "url": settings.odoo_url + "onlyoffice/file/content/" + path_part,
+                    "fileType": file_ext,
+                    "key": str(data["id"]) + str(data["checksum"]),
+                    "permissions": { "edit": can_write },
+                },
+                "editorConfig": {
+                    "mode": "edit" if can_write else "view",
+                    "lang": user.lang,
+                    "user": {"id": str(user.id), "name": user.name},
+                    "customization": {},
+                },
+            }
+
+            if can_write:
+                root_config["editorConfig"]["callbackUrl"] = settings.odoo_url + "onlyoffice/editor/callback/" + path_part
+
+            if settings.jwt_secret:
+                root_config["token"] = jwt_utils.encode_payload(request.env, root_config, settings.jwt_secret)
+
+            return {"docTitle": filename, "docIcon": f"/onlyoffice_odoo/static/description/editor_icons/{document_type}.ico", "docApiJS": settings.public_url + "web-apps/apps/api/documents/api.js", "editorConfig": markupsafe.Markup(json.dumps(root_config))}
 
     def get_attachment(self, attachment_id, user=None):
         IrAttachment = request.env["ir.attachment"]
@@ -181,12 +245,12 @@ class Onlyoffice_Connector(http.Controller):
             return None
 
     def get_user_from_token(self, token):
-        
         if not token:
             raise Exception("missing security token")
 
-        user_id = jwt_utils.decode_token(request.env, token, config_utils.get_internal_jwt_secret(request.env))["id"]
-        user = request.env["res.users"].sudo().browse(user_id).exists().ensure_one()
+        # the token may be cached, the user is checked again on every call
+        user_id = token_utils.get_user_id_from_token(request.env, token)
+        user = request.env["res.users"].sudo().browse(user_id).exists().filtered("active").ensure_one()
         return user
 
     def filter_xss(self, text):
@@ -1,3 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from . import res_config_settings
\ No newline at end of file
+from . import ir_config_parameter
+from . import res_config_settings
+from . import onlyoffice_save_job
+from . import onlyoffice_conversion
+from . import onlyoffice_admission_ticket
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+from odoo import api, models, tools
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+
+class IrConfigParameter(models.Model):
+    _inherit = "ir.config_parameter"
+
+    @api.model
+    @tools.ormcache()
+    def _get_onlyoffice_settings(self):
+        # set_param clears the registry cache, which drops this snapshot in every worker
+        return config_utils.load_settings(self.env)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+from odoo import api, fields, models
+
+from odoo.addons.onlyoffice_odoo.utils import admission_utils
+
+
+class OnlyofficeAdmissionTicket(models.Model):
+    # the tickets are written by admission_utils in transactions of their own, the model only owns the table
+    _name = "onlyoffice.admission.ticket"
+    _description = "ONLYOFFICE Admission Ticket"
+    _order = "id"
+
+    name = fields.Char(required=True)
+    user_id = fields.Many2one("res.users", required=True, ondelete="cascade", index=True)
+    state = fields.Selection(
+        [("waiting", "Waiting"), ("admitted", "Admitted")],
+        default="waiting",
+        required=True,
+        index=True,
+    )
+    heartbeat = fields.Datetime(required=True, default=fields.Datetime.now)
+
+    @api.autovacuum
+    def _gc_tickets(self):
+        admission_utils.delete_stale_tickets(self.env.cr)
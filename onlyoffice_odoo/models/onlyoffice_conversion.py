@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import functools
+import logging
+
+from datetime import timedelta
+from mimetypes import guess_type
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+
+from odoo.addons.onlyoffice_odoo.utils import admission_utils
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+from odoo.addons.onlyoffice_odoo.utils import convert_utils
+from odoo.addons.onlyoffice_odoo.utils import file_utils
+from odoo.addons.onlyoffice_odoo.utils import format_utils
+from odoo.addons.onlyoffice_odoo.utils import stream_utils
+from odoo.addons.onlyoffice_odoo.utils import token_utils
+from odoo.addons.onlyoffice_odoo.utils import url_utils
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+FIRST_POLL_DELAY = 1
+MAX_POLL_DELAY = 30
+CONVERSION_TIMEOUT = 10 * 60
+UNUSED_LIFETIME = 30
+FAILED_LIFETIME = 1
+
+
+class OnlyofficeConversion(models.Model):
+    _name = "onlyoffice.conversion"
+    _description = "ONLYOFFICE Conversion"
+    _order = "id"
+
+    checksum = fields.Char(required=True, index=True)
+    source_format = fields.Char(required=True)
+    target_format = fields.Char(required=True)
+    source_attachment_id = fields.Many2one("ir.attachment", ondelete="set null")
+    user_id = fields.Many2one("res.users", required=True, ondelete="cascade")
+    state = fields.Selection(
+        [("pending", "Pending"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    polls = fields.Integer(default=0)
+    next_poll = fields.Datetime(index=True)
+    started_at = fields.Datetime()
+    # id of the admitted onlyoffice.admission.ticket, not a relation: tickets are deleted outside of this transaction
+    admission_ticket = fields.Integer(copy=False)
+    attachment_id = fields.Many2one("ir.attachment", ondelete="set null")
+    last_used = fields.Datetime(default=fields.Datetime.now, index=True)
+    error = fields.Text()
+
+    # the same content converted to the same format is only converted once
+    _sql_constraints = [
+        ("checksum_target_uniq", "unique(checksum, target_format)", "A conversion of this file to this format already exists."),
+    ]
+
+    @api.model
+    def _request(self, attachment, target_format):
+        # attachment carries the env of the requesting user, reading it checks the access
+        data = attachment.read(["name", "checksum"])[0]
+        source_format = file_utils.get_file_ext(data["name"])
+        if not data["checksum"] or target_format not in format_utils.get_convert_targets(source_format):
+            raise UserError(_("%s files cannot be converted to %s", source_format, target_format))
+
+        Conversion = self.sudo()
+        domain = [("checksum", "=", data["checksum"]), ("target_format", "=", target_format)]
+        conversion = Conversion.search(domain, limit=1)
+
+        # a failed or removed result is converted again
+        if conversion.state == "failed" or (conversion.state == "done" and not conversion.attachment_id):
+            conversion.unlink()
+            conversion = Conversion.browse()
+
+        if conversion:
+            if conversion.state == "done":
+                conversion.last_used = fields.Datetime.now()
+            return conversion
+
+        # concurrent requests for the same file collapse into one conversion
+        self.env.cr.execute(
+            """
+                INSERT INTO onlyoffice_conversion
+                       (checksum, source_format, target_format, source_attachment_id, user_id, state, polls,
+                        last_used, create_uid, write_uid, create_date, write_date)
+                VALUES (%s, %s, %s, %s, %s, 'pending', 0, now() at time zone 'UTC',
+                        %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+                ON CONFLICT (checksum, target_format) DO NOTHING
+            """,
+            (data["checksum"], source_format, target_format, attachment.id, self.env.uid, self.env.uid, self.env.uid),
+        )
+        conversion = Conversion.search(domain, limit=1)
+
+        # the first request is sent at once, small files are often converted before it returns
+        if conversion.state == "pending" and conversion._start():
+            conversion._run_step(conversion._submit)
+        if conversion.state in ("pending", "running"):
+            self._trigger_cron(conversion.next_poll or None)
+        return conversion
+
+    @api.model
+    def _trigger_cron(self, at=None):
+        self.env.ref("onlyoffice_odoo.ir_cron_onlyoffice_conversions")._trigger(at)
+
+    @api.model
+    def _cron_process_conversions(self):
+        now = fields.Datetime.now()
+        for conversion in self.search([("state", "=", "running"), ("next_poll", "<=", now)], limit=BATCH_SIZE):
+            conversion._run_step(conversion._submit)
+            self.env.cr.commit()
+
+        # a conversion left pending is started when a released slot wakes the cron up again
+        for conversion in self.search([("state", "=", "pending")], limit=BATCH_SIZE):
+            if conversion._start():
+                conversion._run_step(conversion._submit)
+            self.env.cr.commit()
+
+        # the cron is woken up again for the closest poll instead of waiting for its interval
+        next_conversion = self.search([("state", "=", "running")], order="next_poll", limit=1)
+        if next_conversion:
+            self._trigger_cron(next_conversion.next_poll)
+
+    def _run_step(self, step):
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                step()
+        except Exception as e:
+            _logger.warning("ONLYOFFICE conversion %s failed: %s", self.id, e)
+            self.write({"state": "failed", "error": str(e)})
+            self._release_slot()
+
+    def _start(self):
+        # conversions take their Document Server slot from the queue of the synchronous calls, with the same
+        # global and per user limits. The slot is taken outside of the step savepoint, so a failed step releases it
+        self.ensure_one()
+        ticket_id = admission_utils.take_slot(self.env, "conversion", self.user_id.id)
+        if not ticket_id:
+            return False
+
+        # the ticket is committed on its own cursor, it is released if the conversion is never committed
+        self.env.cr.postrollback.add(functools.partial(admission_utils.release, self.env, ticket_id))
+        self.write({"state": "running", "started_at": fields.Datetime.now(), "polls": 0, "admission_ticket": ticket_id})
+        return True
+
+    def _release_slot(self):
+        ticket_id = self.admission_ticket
+        if not ticket_id:
+            return
+        self.admission_ticket = 0
+        admission_utils.release(self.env, ticket_id)
+        if self.search_count([("state", "=", "pending")], limit=1):
+            self._trigger_cron()
+
+    def _get_key(self):
+        return f"{self.checksum}_{self.target_format}_{self.id}"
+
+    def _submit(self):
+        # the same request starts the conversion and polls it
+        now = fields.Datetime.now()
+        if not self.source_attachment_id:
+            raise UserError(_("The file to convert was removed"))
+
+        odoo_url = config_utils.get_base_or_odoo_url(self.env)
+        token = token_utils.issue_security_token(self.env, self.user_id.id)
+        file_url = f"{odoo_url}onlyoffice/file/content/{self.source_attachment_id.id}?oo_security_token={token}"
+
+        end, result_url = convert_utils.convert(self.env, file_url, self.source_format, self.target_format, self._get_key())
+        if end:
+            self._collect(result_url)
+            return
+
+        if now - self.started_at > timedelta(seconds=CONVERSION_TIMEOUT):
+            raise UserError(_("Document conversion timed out"))
+
+        polls = self.polls + 1
+        self.write({
+            "polls": polls,
+            "next_poll": now + timedelta(seconds=min(FIRST_POLL_DELAY * 2 ** polls, MAX_POLL_DELAY)),
+        })
+
+    def _collect(self, result_url):
+        if not result_url:
+            raise UserError(_("Document Server did not return the converted file"))
+
+        file_url = url_utils.replace_public_url_to_internal(self.env, result_url)
+        spool, checksum, size = stream_utils.download_to_spool(self.env, file_url, config_utils.get_max_file_size(self.env))
+        with spool:
+            filename = f"{self.checksum}.{convert_utils.get_result_ext(self.target_format)}"
+            mimetype = guess_type(filename)[0]
+            attachment = self.env["ir.attachment"].sudo().create({
+                "name": filename,
+                "mimetype": mimetype,
+                "res_model": self._name,
+                "res_id": self.id,
+            })
+            stream_utils.write_attachment(attachment, spool, checksum, size, mimetype)
+
+        self.write({
+            "state": "done",
+            "attachment_id": attachment.id,
+            "next_poll": False,
+            "last_used": fields.Datetime.now(),
+            "error": False,
+        })
+        self._release_slot()
+
+    def _get_result_name(self, attachment):
+        self.ensure_one()
+        name = attachment.name
+        stem = name[:name.rfind(".")] if "." in name else name
+        return f"{stem}.{convert_utils.get_result_ext(self.target_format)}"
+
+    def _get_status(self, attachment):
+        self.ensure_one()
+        status = {
+            "conversion_id": self.id,
+            "state": self.state,
+        }
+        if self.state == "done":
+            status["href"] = f"/onlyoffice/convert/result/{self.id}?attachment_id={attachment.id}"
+        elif self.state == "failed":
+            status["error"] = self.error or "Unknown error"
+        return status
+
+    def _create_result(self, attachment, values=None):
+        # a new attachment holding the converted file, with the rights of the requesting user,
+        # it shares the stored content of the cached result instead of loading it
+        self.ensure_one()
+        name = self._get_result_name(attachment)
+        result = attachment.env["ir.attachment"].create(dict(values or {}, name=name, mimetype=guess_type(name)[0]))
+        stream_utils.copy_attachment_content(self.attachment_id.sudo(), result)
+        return result
+
+    def _save(self, attachment):
+        # the converted file is added next to its source
+        return self._create_result(attachment, {"res_model": attachment.res_model, "res_id": attachment.res_id})
+
+    def unlink(self):
+        attachments = self.attachment_id
+        res = super().unlink()
+        attachments.sudo().unlink()
+        return res
+
+    @api.autovacuum
+    def _gc_conversions(self):
+        now = fields.Datetime.now()
+        self.search([("state", "=", "done"), ("last_used", "<", now - timedelta(days=UNUSED_LIFETIME))]).unlink()
+        self.search([("state", "=", "failed"), ("write_date", "<", now - timedelta(days=FAILED_LIFETIME))]).unlink()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from mimetypes import guess_type
+
+from odoo import SUPERUSER_ID, api, fields, models
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+from odoo.addons.onlyoffice_odoo.utils import stream_utils
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BATCH_SIZE = 100
+RETRY_DELAY = 60
+DONE_JOBS_LIFETIME = 7
+
+
+class OnlyofficeSaveJob(models.Model):
+    _name = "onlyoffice.save.job"
+    _description = "ONLYOFFICE Save Job"
+    _order = "id"
+
+    key = fields.Char(required=True, index=True)
+    url = fields.Char(required=True)
+    attachment_id = fields.Many2one("ir.attachment", required=True, ondelete="cascade")
+    user_id = fields.Many2one("res.users", required=True, ondelete="cascade")
+    state = fields.Selection(
+        [("pending", "Pending"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    attempts = fields.Integer(default=0)
+    error = fields.Text()
+
+    _sql_constraints = [
+        ("key_url_uniq", "unique(key, url)", "A save job for this document version already exists."),
+    ]
+
+    @api.model
+    def _enqueue(self, attachment, user, key, url):
+        # duplicate callbacks for the same document version collapse into the existing job
+        self.env.cr.execute(
+            """
+                INSERT INTO onlyoffice_save_job
+                       (key, url, attachment_id, user_id, state, attempts, create_uid, write_uid, create_date, write_date)
+                VALUES (%s, %s, %s, %s, 'pending', 0, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+                ON CONFLICT (key, url) DO NOTHING
+            """,
+            (key, url, attachment.id, user.id, self.env.uid, self.env.uid),
+        )
+        self.env.ref("onlyoffice_odoo.ir_cron_onlyoffice_save_jobs")._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        self.env.cr.execute(
+            "SELECT id, attachment_id FROM onlyoffice_save_job WHERE state = 'pending' ORDER BY id LIMIT %s",
+            (BATCH_SIZE,),
+        )
+
+        # saves of the same attachment have to be applied in order, so only the oldest one is taken per run
+        job_ids = {}
+        for job_id, attachment_id in self.env.cr.fetchall():
+            job_ids.setdefault(attachment_id, job_id)
+
+        if not job_ids:
+            return
+
+        dbname = self.env.cr.dbname
+        with ThreadPoolExecutor(max_workers=config_utils.get_save_workers(self.env)) as executor:
+            for job_id in job_ids.values():
+                executor.submit(self._process_job_in_thread, dbname, job_id)
+
+        self.env.cr.execute("SELECT 1 FROM onlyoffice_save_job WHERE state = 'pending' LIMIT 1")
+        if self.env.cr.fetchone():
+            self.env.ref("onlyoffice_odoo.ir_cron_onlyoffice_save_jobs")._trigger(
+                fields.Datetime.now() + timedelta(seconds=RETRY_DELAY)
+            )
+
+    def _process_job_in_thread(self, dbname, job_id):
+        threading.current_thread().dbname = dbname
+        try:
+            with self.pool.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env["onlyoffice.save.job"]._process_job(job_id)
+        except Exception:
+            _logger.exception("Failed to process ONLYOFFICE save job %s", job_id)
+
+    @api.model
+    def _process_job(self, job_id):
+        self.env.cr.execute(
+            "SELECT id FROM onlyoffice_save_job WHERE id = %s AND state = 'pending' FOR UPDATE SKIP LOCKED",
+            (job_id,),
+        )
+        if not self.env.cr.fetchone():
+            return  # already taken by another worker
+
+        job = self.browse(job_id)
+        try:
+            with self.env.cr.savepoint():
+                job._save()
+            job.write({"state": "done", "error": False})
+        except Exception as ex:
+            _logger.warning("ONLYOFFICE save job %s failed: %s", job.id, ex)
+            attempts = job.attempts + 1
+            job.write({
+                "attempts": attempts,
+                "error": str(ex),
+                "state": "failed" if attempts >= MAX_ATTEMPTS else "pending",
+            })
+
+    def _save(self):
+        self.ensure_one()
+        attachment = self.attachment_id.with_user(self.user_id)
+
+        spool, checksum, size = stream_utils.download_to_spool(self.env, self.url, config_utils.get_max_file_size(self.env))
+        with spool:
+            if attachment.checksum == checksum:
+                return  # the content is already saved
+
+            stream_utils.write_attachment(attachment, spool, checksum, size, guess_type(self.url)[0])
+
+    @api.autovacuum
+    def _gc_done_jobs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=DONE_JOBS_LIFETIME)
+        self.search([("state", "=", "done"), ("write_date", "<", limit_date)]).unlink()
@@ -42,6 +42,7 @@ class ResConfigSettings(models.TransientModel):
         config_utils.set_jwt_secret(self.env, self.doc_server_jwt_secret)
         config_utils.set_jwt_header(self.env, self.doc_server_jwt_header)
         config_utils.set_demo(self.env, self.doc_server_demo)
+        config_utils.invalidate_settings(self.env)
         
     def set_values(self):
         res = super().set_values()
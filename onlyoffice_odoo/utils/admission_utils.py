@@ -0,0 +1,146 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import logging
+import time
+
+from contextlib import contextmanager
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+from odoo.addons.onlyoffice_odoo.utils import metrics_utils
+
+_logger = logging.getLogger(__name__)
+
+# serializes the admission decisions of all workers
+LOCK_KEY = 0x4F4F0000
+FIRST_WAIT = 0.05
+MAX_WAIT = 1
+# a waiting ticket is refreshed on every check, an admitted one only when it is admitted
+WAITING_LIFETIME = 30
+ADMITTED_LIFETIME = 60 * 60
+
+
+class AdmissionError(Exception):
+    pass
+
+
+@contextmanager
+def admit(env, name, user_id=None):
+    # every call waits in onlyoffice_admission_ticket, the turn goes to the oldest ticket of the user with
+    # the fewest admitted calls. Each step is a short transaction of its own, so no cursor is held while
+    # the call waits or runs, and a ticket left by a dead worker expires
+    global_limit, user_limit = config_utils.get_admission_limits(env)
+    timeout = config_utils.get_admission_timeout(env)
+    user_id = user_id or env.uid
+
+    start = time.monotonic()
+    wait = FIRST_WAIT
+    with env.registry.cursor() as cr:
+        ticket_id = insert_ticket(cr, name, user_id)
+
+    try:
+        while True:
+            with env.registry.cursor() as cr:
+                if take_turn(cr, ticket_id, global_limit, user_limit):
+                    break
+            wait = sleep_or_fail(name, start, timeout, wait)
+
+        metrics_utils.observe("admission." + name, time.monotonic() - start)
+        yield
+    finally:
+        release(env, ticket_id)
+
+
+def take_slot(env, name, user_id):
+    # for asynchronous calls that do not wait: the ticket joins the queue and is admitted at once if it
+    # has the turn, otherwise it is dropped. The admitted ticket is released with release once the call ends
+    global_limit, user_limit = config_utils.get_admission_limits(env)
+    with env.registry.cursor() as cr:
+        ticket_id = insert_ticket(cr, name, user_id)
+        if take_turn(cr, ticket_id, global_limit, user_limit):
+            return ticket_id
+        cr.rollback()
+    return None
+
+
+def release(env, ticket_id):
+    with env.registry.cursor() as cr:
+        cr.execute("DELETE FROM onlyoffice_admission_ticket WHERE id = %s", (ticket_id,))
+
+
+def insert_ticket(cr, name, user_id):
+    cr.execute(
+        """
+            INSERT INTO onlyoffice_admission_ticket
+                   (name, user_id, state, heartbeat, create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, 'waiting', now() at time zone 'UTC', %s, %s,
+                    now() at time zone 'UTC', now() at time zone 'UTC')
+            RETURNING id
+        """,
+        (name, user_id, user_id, user_id),
+    )
+    return cr.fetchone()[0]
+
+
+def take_turn(cr, ticket_id, global_limit, user_limit):
+    cr.execute("SELECT pg_advisory_xact_lock(%s)", (LOCK_KEY,))
+    delete_stale_tickets(cr, ticket_id)
+    cr.execute(
+        "UPDATE onlyoffice_admission_ticket SET heartbeat = now() at time zone 'UTC' WHERE id = %s",
+        (ticket_id,),
+    )
+
+    cr.execute("SELECT count(*) FROM onlyoffice_admission_ticket WHERE state = 'admitted'")
+    if cr.fetchone()[0] >= global_limit:
+        return False
+
+    # users at their own limit are skipped, so they never hold back the queue of the others
+    cr.execute(
+        """
+            WITH admitted AS (
+                SELECT user_id, count(*) AS calls
+                  FROM onlyoffice_admission_ticket
+                 WHERE state = 'admitted'
+                 GROUP BY user_id
+            )
+            SELECT ticket.id
+              FROM onlyoffice_admission_ticket ticket
+              LEFT JOIN admitted ON admitted.user_id = ticket.user_id
+             WHERE ticket.state = 'waiting' AND COALESCE(admitted.calls, 0) < %s
+             ORDER BY COALESCE(admitted.calls, 0), ticket.id
+             LIMIT 1
+        """,
+        (user_limit,),
+    )
+    row = cr.fetchone()
+    if not row or row[0] != ticket_id:
+        return False
+
+    cr.execute(
+        "UPDATE onlyoffice_admission_ticket SET state = 'admitted', heartbeat = now() at time zone 'UTC' WHERE id = %s",
+        (ticket_id,),
+    )
+    return True
+
+
+def delete_stale_tickets(cr, ticket_id=None):
+    cr.execute(
+        """
+            DELETE FROM onlyoffice_admission_ticket
+             WHERE id != %s
+               AND ((state = 'waiting' AND heartbeat < now() at time zone 'UTC' - %s * interval '1 second')
+                 OR (state = 'admitted' AND heartbeat < now() at time zone 'UTC' - %s * interval '1 second'))
+        """,
+        (ticket_id or 0, WAITING_LIFETIME, ADMITTED_LIFETIME),
+    )
+
+
+def sleep_or_fail(name, start, timeout, wait):
+    if time.monotonic() - start + wait > timeout:
+        metrics_utils.incr("admission." + name + ".rejected")
+        _logger.warning("No free Document Server slot for %s after %s seconds", name, timeout)
+        raise AdmissionError("Document Server is busy, please try again later")
+
+    time.sleep(wait)
+    return min(wait * 2, MAX_WAIT)
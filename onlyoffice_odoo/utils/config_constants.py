@@ -10,4 +10,22 @@ DOC_SERVER_JWT_HEADER = "onlyoffice_connector.doc_server_jwt_header"
 DOC_SERVER_DEMO = "onlyoffice_connector.doc_server_demo"
 DOC_SERVER_DEMO_DATE = "onlyoffice_connector.doc_server_demo_date"
 
-INTERNAL_JWT_SECRET = "onlyoffice_connector.internal_jwt_secret"
\ No newline at end of file
+INTERNAL_JWT_SECRET = "onlyoffice_connector.internal_jwt_secret"
+
+MAX_FILE_SIZE = "onlyoffice_connector.max_file_size"
+SAVE_WORKERS = "onlyoffice_connector.save_workers"
+SECURITY_TOKEN_LIFETIME = "onlyoffice_connector.security_token_lifetime"
+HTTP_CONNECT_TIMEOUT = "onlyoffice_connector.http_connect_timeout"
+HTTP_READ_TIMEOUT = "onlyoffice_connector.http_read_timeout"
+FILE_OFFLOAD = "onlyoffice_connector.file_offload"
+FILE_OFFLOAD_PREFIX = "onlyoffice_connector.file_offload_prefix"
+TEMPLATE_BATCH_SIZE = "onlyoffice_connector.template_batch_size"
+TEMPLATE_PARALLEL_JOBS = "onlyoffice_connector.template_parallel_jobs"
+TEMPLATE_DATA_BUDGET = "onlyoffice_connector.template_data_budget"
+TEMPLATE_RELATION_ROW_LIMIT = "onlyoffice_connector.template_relation_row_limit"
+TEMPLATE_CACHE = "onlyoffice_connector.template_cache"
+TEMPLATE_CACHE_TTL = "onlyoffice_connector.template_cache_ttl"
+TEMPLATE_CACHE_SIZE = "onlyoffice_connector.template_cache_size"
+ADMISSION_GLOBAL_LIMIT = "onlyoffice_connector.admission_global_limit"
+ADMISSION_USER_LIMIT = "onlyoffice_connector.admission_user_limit"
+ADMISSION_TIMEOUT = "onlyoffice_connector.admission_timeout"
@@ -3,46 +3,164 @@
 #
 
 import uuid
+from collections import namedtuple
 from datetime import date
 
 from odoo.addons.onlyoffice_odoo.utils import config_constants
 
+DEFAULT_MAX_FILE_SIZE = 1024 * 1024 * 1024
+DEFAULT_SAVE_WORKERS = 4
+DEFAULT_SECURITY_TOKEN_LIFETIME = 7 * 24 * 60 * 60
+DEFAULT_HTTP_CONNECT_TIMEOUT = 10
+DEFAULT_HTTP_READ_TIMEOUT = 120
+DEFAULT_FILE_OFFLOAD_PREFIX = "/web/filestore/"
+DEFAULT_TEMPLATE_BATCH_SIZE = 50
+DEFAULT_TEMPLATE_PARALLEL_JOBS = 4
+DEFAULT_TEMPLATE_DATA_BUDGET = 256 * 1024
+DEFAULT_TEMPLATE_RELATION_ROW_LIMIT = 10000
+DEFAULT_TEMPLATE_CACHE_TTL = 7 * 24 * 60 * 60
+DEFAULT_TEMPLATE_CACHE_SIZE = 1024 * 1024 * 1024
+DEFAULT_ADMISSION_GLOBAL_LIMIT = 8
+DEFAULT_ADMISSION_USER_LIMIT = 2
+DEFAULT_ADMISSION_TIMEOUT = 60
+
+# immutable snapshot of the connector settings, cached per worker and database by ir.config_parameter
+ConnectorSettings = namedtuple(
+    "ConnectorSettings",
+    [
+        "odoo_url",
+        "public_url",
+        "inner_url",
+        "jwt_secret",
+        "jwt_header",
+        "internal_jwt_secret",
+        "demo",
+        "demo_date",
+        "max_file_size",
+        "save_workers",
+        "security_token_lifetime",
+        "http_connect_timeout",
+        "http_read_timeout",
+        "file_offload",
+        "file_offload_prefix",
+        "template_batch_size",
+        "template_parallel_jobs",
+        "template_data_budget",
+        "template_relation_row_limit",
+        "template_cache",
+        "template_cache_ttl",
+        "template_cache_size",
+        "admission_global_limit",
+        "admission_user_limit",
+        "admission_timeout",
+    ],
+)
+
+def load_settings(env):
+    get_param = env["ir.config_parameter"].sudo().get_param
+
+    public_url = fix_url(get_param(config_constants.DOC_SERVER_PUBLIC_URL) or "http://documentserver/")
+
+    return ConnectorSettings(
+        odoo_url=fix_url(get_param(config_constants.DOC_SERVER_ODOO_URL) or get_param("web.base.url")),
+        public_url=public_url,
+        inner_url=fix_url(get_param(config_constants.DOC_SERVER_INNER_URL) or public_url),
+        jwt_secret=get_param(config_constants.DOC_SERVER_JWT_SECRET),
+        jwt_header=get_param(config_constants.DOC_SERVER_JWT_HEADER) or "Authorization",
+        internal_jwt_secret=get_param(config_constants.INTERNAL_JWT_SECRET),
+        demo=get_param(config_constants.DOC_SERVER_DEMO),
+        demo_date=get_param(config_constants.DOC_SERVER_DEMO_DATE),
+        max_file_size=to_int(get_param(config_constants.MAX_FILE_SIZE), DEFAULT_MAX_FILE_SIZE),
+        save_workers=max(to_int(get_param(config_constants.SAVE_WORKERS), DEFAULT_SAVE_WORKERS), 1),
+        security_token_lifetime=to_int(get_param(config_constants.SECURITY_TOKEN_LIFETIME), DEFAULT_SECURITY_TOKEN_LIFETIME),
+        http_connect_timeout=to_int(get_param(config_constants.HTTP_CONNECT_TIMEOUT), DEFAULT_HTTP_CONNECT_TIMEOUT),
+        http_read_timeout=to_int(get_param(config_constants.HTTP_READ_TIMEOUT), DEFAULT_HTTP_READ_TIMEOUT),
+        file_offload=(get_param(config_constants.FILE_OFFLOAD) or "").lower(),
+        file_offload_prefix=fix_end_slash(get_param(config_constants.FILE_OFFLOAD_PREFIX) or DEFAULT_FILE_OFFLOAD_PREFIX),
+        template_batch_size=max(to_int(get_param(config_constants.TEMPLATE_BATCH_SIZE), DEFAULT_TEMPLATE_BATCH_SIZE), 1),
+        template_parallel_jobs=max(to_int(get_param(config_constants.TEMPLATE_PARALLEL_JOBS), DEFAULT_TEMPLATE_PARALLEL_JOBS), 1),
+        template_data_budget=max(to_int(get_param(config_constants.TEMPLATE_DATA_BUDGET), DEFAULT_TEMPLATE_DATA_BUDGET), 1024),
+        template_relation_row_limit=to_int(get_param(config_constants.TEMPLATE_RELATION_ROW_LIMIT), DEFAULT_TEMPLATE_RELATION_ROW_LIMIT),
+        template_cache=to_bool(get_param(config_constants.TEMPLATE_CACHE)),
+        template_cache_ttl=to_int(get_param(config_constants.TEMPLATE_CACHE_TTL), DEFAULT_TEMPLATE_CACHE_TTL),
+        template_cache_size=to_int(get_param(config_constants.TEMPLATE_CACHE_SIZE), DEFAULT_TEMPLATE_CACHE_SIZE),
+        admission_global_limit=max(to_int(get_param(config_constants.ADMISSION_GLOBAL_LIMIT), DEFAULT_ADMISSION_GLOBAL_LIMIT), 1),
+        admission_user_limit=max(to_int(get_param(config_constants.ADMISSION_USER_LIMIT), DEFAULT_ADMISSION_USER_LIMIT), 1),
+        admission_timeout=to_int(get_param(config_constants.ADMISSION_TIMEOUT), DEFAULT_ADMISSION_TIMEOUT),
+    )
+
+def get_settings(env):
+    return env["ir.config_parameter"].sudo()._get_onlyoffice_settings()
+
+def invalidate_settings(env):
+    # clearing the registry cache is signalled to the other workers on commit
+    env.registry.clear_cache()
+
 def get_base_or_odoo_url(env):
-    url = env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_ODOO_URL)
-    return fix_url(url or env["ir.config_parameter"].sudo().get_param("web.base.url"))
+    return get_settings(env).odoo_url
 
 def get_doc_server_public_url(env):
-    url = env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_PUBLIC_URL)
-    if not url:
-        url = "http://documentserver/"
-    return fix_url(url)
+    return get_settings(env).public_url
 
 def get_doc_server_inner_url(env):
-    url = env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_INNER_URL)
-    return fix_url(url or get_doc_server_public_url(env))
+    return get_settings(env).inner_url
 
 def get_jwt_header(env):
-    header = env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_JWT_HEADER)
-    if not header:
-        header = "Authorization"
-    return header
+    return get_settings(env).jwt_header
 
 def get_jwt_secret(env):
-    return env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_JWT_SECRET)
+    return get_settings(env).jwt_secret
 
 def get_internal_jwt_secret(env):
-    secret = env["ir.config_parameter"].sudo().get_param(config_constants.INTERNAL_JWT_SECRET)
+    secret = get_settings(env).internal_jwt_secret
     if not secret:
         secret = uuid.uuid4().hex
-        env["ir.config_parameter"].set_param(config_constants.INTERNAL_JWT_SECRET, secret)
+        env["ir.config_parameter"].sudo().set_param(config_constants.INTERNAL_JWT_SECRET, secret)
 
     return secret
 
+def get_max_file_size(env):
+    return get_settings(env).max_file_size
+
+def get_save_workers(env):
+    return get_settings(env).save_workers
+
+def get_security_token_lifetime(env):
+    return get_settings(env).security_token_lifetime
+
+def get_http_timeout(env):
+    settings = get_settings(env)
+    return (settings.http_connect_timeout, settings.http_read_timeout)
+
+def get_template_batch_size(env):
+    return get_settings(env).template_batch_size
+
+def get_template_parallel_jobs(env):
+    return get_settings(env).template_parallel_jobs
+
+def get_template_data_limits(env):
+    settings = get_settings(env)
+    return (settings.template_data_budget, settings.template_relation_row_limit)
+
+def is_template_cache_enabled(env):
+    return get_settings(env).template_cache
+
+def get_template_cache_limits(env):
+    settings = get_settings(env)
+    return (settings.template_cache_ttl, settings.template_cache_size)
+
+def get_admission_limits(env):
+    settings = get_settings(env)
+    return (settings.admission_global_limit, settings.admission_user_limit)
+
+def get_admission_timeout(env):
+    return get_settings(env).admission_timeout
+
 def get_demo(env):
-    return env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_DEMO)
+    return get_settings(env).demo
 
 def get_demo_date(env):
-    return env["ir.config_parameter"].sudo().get_param(config_constants.DOC_SERVER_DEMO_DATE)
+    return get_settings(env).demo_date
 
 def set_doc_server_public_url(env, url):
     if not url:
@@ -84,6 +202,15 @@ def set_demo_date(env):
     demo_date = date.today()
     env["ir.config_parameter"].sudo().set_param(config_constants.DOC_SERVER_DEMO_DATE, demo_date)
 
+def to_int(value, default):
+    try:
+        return int(value) if value else default
+    except ValueError:
+        return default
+
+def to_bool(value):
+    return str(value).lower() in ("1", "true", "yes")
+
 def fix_url(url):
     if url:
         return fix_end_slash(fix_proto(url))
@@ -0,0 +1,48 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils, http_utils, jwt_utils, validation_utils
+
+# conversions whose result has another extension than the requested output type
+RESULT_EXTS = {"pdfa": "pdf"}
+
+
+class ConversionError(Exception):
+    def __init__(self, code):
+        self.code = code
+        super().__init__(validation_utils.get_conversion_error_message(code))
+
+
+def get_result_ext(outputtype):
+    return RESULT_EXTS.get(outputtype, outputtype)
+
+
+def convert(env, file_url, filetype, outputtype, key, title=None):
+    # an async request returns at once, it is sent again with the same key until endConvert is set
+    settings = config_utils.get_settings(env)
+
+    payload = {
+        "async": True,
+        "url": file_url,
+        "filetype": filetype,
+        "outputtype": outputtype,
+        "key": key,
+    }
+    if title:
+        payload["title"] = title
+
+    headers = {"Content-Type": "application/json", "Accept": "application/json"}
+
+    if settings.jwt_secret:
+        payload["token"] = jwt_utils.encode_payload(env, payload, settings.jwt_secret)
+        headers[settings.jwt_header] = "Bearer " + jwt_utils.encode_payload(env, {"payload": payload}, settings.jwt_secret)
+
+    response = http_utils.post(env, f"{settings.public_url}ConvertService.ashx", json=payload, headers=headers)
+    response.raise_for_status()
+    response_json = response.json()
+
+    if response_json.get("error"):
+        raise ConversionError(response_json.get("error"))
+
+    return bool(response_json.get("endConvert")), response_json.get("fileUrl")
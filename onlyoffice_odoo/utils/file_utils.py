@@ -2,6 +2,7 @@
 # (c) Copyright Ascensio System SIA 2024
 #
 
+import functools
 import os
 
 from odoo.addons.onlyoffice_odoo.utils import format_utils
@@ -22,35 +23,24 @@ def get_file_ext(name):
 
 
 def get_file_type(context):
-    for format in format_utils.get_supported_formats():
-        if format.name == get_file_ext(context):
-            return format.type
-
-    return None
+    format = format_utils.get_format(get_file_ext(context))
+    return format.type if format else None
 
 
 def can_view(context):
-    for format in format_utils.get_supported_formats():
-        if format.name == get_file_ext(context):
-            return True
-
-    return False
+    return get_file_ext(context) in format_utils.VIEWABLE
 
 
 def can_edit(context):
-    for format in format_utils.get_supported_formats():
-        if format.name == get_file_ext(context):
-            return format.edit
-
-    return False
+    return get_file_ext(context) in format_utils.EDITABLE
 
 
 def can_fill_form(context):
-    for format in format_utils.get_supported_formats():
-        if format.name == get_file_ext(context):
-            return format.fillForm
+    return get_file_ext(context) in format_utils.FILLABLE
+
 
-    return False
+def get_formats(filenames):
+    return {filename: format_utils.get_format(get_file_ext(filename)) for filename in filenames}
 
 
 def get_default_ext_by_type(str):
@@ -90,46 +80,71 @@ def get_mime_by_ext(str):
 
     return None
 
-def get_default_file_template(lang, ext):
-    locale_path = {
-        "az": "az-Latn-AZ",
-        "bg": "bg-BG",
-        "cs": "cs-CZ",
-        "de": "de-DE",
-        "el": "el-GR",
-        "en-gb": "en-GB",
-        "en": "en-US",
-        "es": "es-ES",
-        "fr": "fr-FR",
-        "it": "it-IT",
-        "ja": "ja-JP",
-        "ko": "ko-KR",
-        "lv": "lv-LV",
-        "nl": "nl-NL",
-        "pl": "pl-PL",
-        "pt-br": "pt-BR",
-        "pt": "pt-PT",
-        "ru": "ru-RU",
-        "sk": "sk-SK",
-        "sv": "sv-SE",
-        "uk": "uk-UA",
-        "vi": "vi-VN",
-        "zh": "zh-CN",
-    }
-
+_LOCALE_PATH = {
+    "az": "az-Latn-AZ",
+    "bg": "bg-BG",
+    "cs": "cs-CZ",
+    "de": "de-DE",
+    "el": "el-GR",
+    "en-gb": "en-GB",
+    "en": "en-US",
+    "es": "es-ES",
+    "fr": "fr-FR",
+    "it": "it-IT",
+    "ja": "ja-JP",
+    "ko": "ko-KR",
+    "lv": "lv-LV",
+    "nl": "nl-NL",
+    "pl": "pl-PL",
+    "pt-br": "pt-BR",
+    "pt": "pt-PT",
+    "ru": "ru-RU",
+    "sk": "sk-SK",
+    "sv": "sv-SE",
+    "uk": "uk-UA",
+    "vi": "vi-VN",
+    "zh": "zh-CN",
+}
+
+_TEMPLATES_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "static", "assets", "document_templates")
+_TEMPLATE_EXTS = ("docx", "xlsx", "pptx", "pdf")
+
+
+@functools.lru_cache(maxsize=256)
+def get_locale(lang):
     lang = lang.replace("_", "-")
 
-    locale = locale_path.get(lang)
+    locale = _LOCALE_PATH.get(lang)
     if locale is None:
         lang = lang.split("-")[0]
-        locale = locale_path.get(lang)
+        locale = _LOCALE_PATH.get(lang)
         if locale is None:
-            locale = locale_path.get("en")
+            locale = _LOCALE_PATH.get("en")
+
+    return locale
+
+
+@functools.lru_cache(maxsize=len(_LOCALE_PATH) * len(_TEMPLATE_EXTS))
+def _read_default_file_template(locale, ext):
+    with open(os.path.join(_TEMPLATES_PATH, locale, "new." + ext), "rb") as file:
+        return file.read()
+
+
+def get_default_file_template(lang, ext):
+    return _read_default_file_template(get_locale(lang), ext)
+
+
+def get_default_file_template_cache_info():
+    return _read_default_file_template.cache_info()
+
+
+def _warm_default_file_templates():
+    for locale in set(_LOCALE_PATH.values()):
+        for ext in _TEMPLATE_EXTS:
+            try:
+                _read_default_file_template(locale, ext)
+            except OSError:
+                continue
 
-    file = open(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", "static", "assets", "document_templates", locale, "new." + ext), "rb")
 
-    try:
-        file_data = file.read()
-        return file_data
-    finally:
-        file.close()
\ No newline at end of file
+_warm_default_file_templates()
@@ -0,0 +1,90 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import threading
+import time
+
+import requests
+
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlparse
+from urllib3.util.retry import Retry
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+from odoo.addons.onlyoffice_odoo.utils import metrics_utils
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 20
+RETRIES = 3
+BACKOFF_FACTOR = 0.5
+CHUNK_SIZE = 64 * 1024
+
+ENDPOINTS = ("docbuilder", "ConvertService.ashx", "CommandService.ashx", "healthcheck")
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    # one keep-alive session per worker, urllib3 keeps a connection pool per Document Server host
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRIES,
+                    backoff_factor=BACKOFF_FACTOR,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=frozenset(["GET", "HEAD"]),
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_endpoint(url):
+    name = urlparse(url).path.rstrip("/").rsplit("/", 1)[-1]
+    return name if name in ENDPOINTS else "download"
+
+
+def request(env, method, url, endpoint=None, **kwargs):
+    kwargs.setdefault("timeout", config_utils.get_http_timeout(env))
+    metric = "http." + (endpoint or get_endpoint(url))
+
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except Exception:
+        metrics_utils.incr(metric + ".errors")
+        raise
+    finally:
+        metrics_utils.observe(metric, time.monotonic() - start)
+
+    if not kwargs.get("stream"):
+        metrics_utils.incr(metric + ".bytes", len(response.content))
+
+    return response
+
+
+def get(env, url, **kwargs):
+    return request(env, "GET", url, **kwargs)
+
+
+def post(env, url, **kwargs):
+    return request(env, "POST", url, **kwargs)
+
+
+def iter_content(env, url, chunk_size=CHUNK_SIZE, endpoint=None):
+    metric = "http." + (endpoint or get_endpoint(url))
+
+    with request(env, "GET", url, endpoint=endpoint, stream=True) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size):
+            metrics_utils.incr(metric + ".bytes", len(chunk))
+            yield chunk
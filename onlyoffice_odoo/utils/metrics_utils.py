@@ -0,0 +1,69 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import threading
+import time
+
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+SAMPLES_SIZE = 1000
+
+# per worker counters and the latest timing samples, reset on restart
+_lock = threading.Lock()
+_counters = defaultdict(int)
+_samples = defaultdict(lambda: deque(maxlen=SAMPLES_SIZE))
+
+
+def incr(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def observe(name, seconds):
+    with _lock:
+        _counters[name + ".count"] += 1
+        _counters[name + ".seconds"] += seconds
+        _samples[name].append(seconds)
+
+
+@contextmanager
+def timer(name):
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        observe(name, time.monotonic() - start)
+
+
+def percentile(samples, percent):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    index = min(int(round(percent / 100.0 * (len(samples) - 1))), len(samples) - 1)
+    return samples[index]
+
+
+def get_stats():
+    with _lock:
+        counters = dict(_counters)
+        samples = {name: list(values) for name, values in _samples.items()}
+
+    return {
+        "counters": counters,
+        "timings": {
+            name: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p99": percentile(values, 99),
+            }
+            for name, values in samples.items()
+        },
+    }
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _samples.clear()
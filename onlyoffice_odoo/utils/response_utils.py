@@ -0,0 +1,71 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+from urllib.parse import quote
+
+from werkzeug.http import is_resource_modified
+
+from odoo.http import content_disposition
+
+from odoo.addons.onlyoffice_odoo.utils import metrics_utils
+
+OFFLOAD_MODES = ("nginx", "apache")
+
+
+def is_not_modified(httprequest, attachment):
+    # checks If-None-Match and If-Modified-Since against the attachment checksum and write date
+    return not is_resource_modified(
+        httprequest.environ,
+        etag=attachment.checksum,
+        last_modified=attachment.write_date,
+    )
+
+
+def set_validators(response, attachment):
+    if attachment.checksum:
+        response.set_etag(attachment.checksum)
+    if attachment.write_date:
+        response.last_modified = attachment.write_date
+    return response
+
+
+def not_modified(request, attachment):
+    return set_validators(request.make_response("", status=304), attachment)
+
+
+def stream(request, attachment, download_name=None, mimetype=None):
+    # sends the file from the filestore without loading it, strong validators let werkzeug answer conditional and Range requests
+    stream = request.env["ir.binary"]._get_stream_from(attachment, "raw", None, "name", mimetype)
+    if download_name:
+        stream.download_name = download_name
+
+    stream.etag = attachment.checksum
+    stream.last_modified = attachment.write_date
+    stream.conditional = True
+
+    return stream.get_response(as_attachment=True, max_age=None)
+
+
+def offload(request, attachment, mode, prefix):
+    # lets the front proxy stream filestore files, X-Accel-Redirect for nginx and X-Sendfile for Apache
+    if mode not in OFFLOAD_MODES:
+        return None
+
+    if not attachment.store_fname:
+        metrics_utils.incr("offload.fallback")
+        return None
+
+    headers = [
+        ("Content-Type", attachment.mimetype or "application/octet-stream"),
+        ("Content-Disposition", content_disposition(attachment.name)),
+    ]
+    if mode == "nginx":
+        # the filestore is split per database, like Odoo's own /web/filestore/<db>/ location
+        location = f"{attachment.env.cr.dbname}/{attachment.store_fname}"
+        headers.append(("X-Accel-Redirect", prefix + quote(location)))
+    else:
+        headers.append(("X-Sendfile", attachment._full_path(attachment.store_fname)))
+
+    metrics_utils.incr("offload." + mode)
+    return set_validators(request.make_response("", headers), attachment)
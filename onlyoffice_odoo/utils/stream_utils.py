@@ -0,0 +1,123 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+
+from odoo.addons.onlyoffice_odoo.utils import http_utils
+
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 2 * 1024 * 1024
+
+
+class FileTooLargeError(Exception):
+    pass
+
+
+def download_to_spool(env, url, max_size=None):
+    # the file is kept in memory only while it is small, larger files roll over to disk
+    spool = new_spool()
+    sha = hashlib.sha1()
+    size = 0
+
+    try:
+        for chunk in http_utils.iter_content(env, url, CHUNK_SIZE):
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise FileTooLargeError("file exceeds the maximum size of %s bytes" % max_size)
+
+            sha.update(chunk)
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, sha.hexdigest(), size
+
+
+
+def new_spool():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+
+
+def hash_spool(spool):
+    # checksum and size of a spool written by the caller, it is rewound for write_attachment
+    sha = hashlib.sha1()
+    size = 0
+    spool.seek(0)
+    for chunk in iter(lambda: spool.read(CHUNK_SIZE), b""):
+        sha.update(chunk)
+        size += len(chunk)
+    spool.seek(0)
+    return sha.hexdigest(), size
+
+
+def open_attachment(attachment):
+    # files in the filestore are opened directly, only database stored content is loaded
+    if attachment.store_fname:
+        return open(attachment._full_path(attachment.store_fname), "rb")
+    return io.BytesIO(attachment.raw or b"")
+
+
+def write_attachment(attachment, spool, checksum, size, mimetype):
+    if size <= SPOOL_MAX_SIZE or attachment._storage() != "file":
+        attachment.write({"raw": spool.read(), "mimetype": mimetype})
+        return
+
+    # checks the access rights and updates write_date/write_uid
+    attachment.write({"mimetype": mimetype})
+
+    IrAttachment = attachment.sudo()
+    fname = checksum[:2] + "/" + checksum
+    full_path = IrAttachment._full_path(fname)
+
+    if not os.path.isfile(full_path):
+        dirname = os.path.dirname(full_path)
+        os.makedirs(dirname, exist_ok=True)
+
+        with tempfile.NamedTemporaryFile(dir=dirname, delete=False) as file:
+            try:
+                shutil.copyfileobj(spool, file, CHUNK_SIZE)
+            except Exception:
+                os.unlink(file.name)
+                raise
+
+        os.replace(file.name, full_path)
+
+    old_fname = attachment.store_fname
+
+    # ir.attachment.write drops store_fname/checksum/file_size, so they are set directly
+    attachment.env.cr.execute(
+        """
+            UPDATE ir_attachment
+               SET store_fname = %s, checksum = %s, file_size = %s, db_datas = NULL, index_content = NULL
+             WHERE id = %s
+        """,
+        (fname, checksum, size, attachment.id),
+    )
+    attachment.invalidate_recordset()
+
+    if old_fname and old_fname != fname:
+        IrAttachment._file_delete(old_fname)
+
+
+def copy_attachment_content(source, target):
+    # the filestore keeps one file per checksum, so the target points to the file of the source instead of
+    # reading it, like ir.attachment does for identical contents
+    target.check_access_rights("write")
+    target.env.cr.execute(
+        """
+            UPDATE ir_attachment target
+               SET store_fname = source.store_fname, db_datas = source.db_datas, checksum = source.checksum,
+                   file_size = source.file_size, index_content = NULL
+              FROM ir_attachment source
+             WHERE source.id = %s AND target.id = %s
+        """,
+        (source.id, target.id),
+    )
+    target.invalidate_recordset()
@@ -0,0 +1,52 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import threading
+import time
+
+from collections import OrderedDict
+
+from odoo.addons.onlyoffice_odoo.utils import config_utils
+from odoo.addons.onlyoffice_odoo.utils import jwt_utils
+
+CACHE_SIZE = 1024
+LEGACY_TOKEN_CACHE_TTL = 5 * 60
+
+# verified token -> (user id, expiration time), shared by the threads of the worker
+_verified_tokens = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+
+def issue_security_token(env, user_id):
+    now = int(time.time())
+    payload = {"id": user_id, "iat": now, "exp": now + config_utils.get_security_token_lifetime(env)}
+    return jwt_utils.encode_payload(env, payload, config_utils.get_internal_jwt_secret(env))
+
+
+def get_user_id_from_token(env, token):
+    secret = config_utils.get_internal_jwt_secret(env)
+    key = (env.cr.dbname, secret, token)
+    now = time.time()
+
+    with _verified_tokens_lock:
+        cached = _verified_tokens.get(key)
+        if cached:
+            if cached[1] > now:
+                _verified_tokens.move_to_end(key)
+                return cached[0]
+            del _verified_tokens[key]
+
+    payload = jwt_utils.decode_token(env, token, secret)
+    user_id = payload["id"]
+    env["res.users"].sudo().browse(user_id).exists().ensure_one()
+
+    # tokens issued before expiration was added are only kept for a short time
+    expires = payload.get("exp") or now + LEGACY_TOKEN_CACHE_TTL
+
+    with _verified_tokens_lock:
+        _verified_tokens[key] = (user_id, expires)
+        while len(_verified_tokens) > CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+
+    return user_id
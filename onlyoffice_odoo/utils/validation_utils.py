@@ -1,11 +1,11 @@
+from odoo.addons.onlyoffice_odoo.utils import admission_utils
+from odoo.addons.onlyoffice_odoo.utils import http_utils
 from odoo.addons.onlyoffice_odoo.utils import jwt_utils
 from odoo.exceptions import ValidationError
 
-from urllib.request import urlopen
 import json
 import os
 import re
-import requests
 import time
 
 def valid_url(url):
@@ -24,7 +24,7 @@ def settings_validation(self):
         demo = self.doc_server_demo
 
         check_mixed_content(base_url, public_url, demo)
-        check_doc_serv_url(public_url, demo)
+        check_doc_serv_url(self.env, public_url, demo)
         check_doc_serv_command_service(self.env, public_url, jwt_secret, jwt_header, demo)
         check_doc_serv_convert_service(self.env, public_url, base_url, jwt_secret, jwt_header, demo)
 
@@ -32,10 +32,10 @@ def check_mixed_content(base_url, public_url, demo):
     if (base_url.startswith("https") and not public_url.startswith("https")):
         get_message_error("Mixed Active Content is not allowed. HTTPS address for Document Server is required.", demo)
 
-def check_doc_serv_url(public_url, demo):
+def check_doc_serv_url(env, public_url, demo):
     try:
-        response = urlopen(os.path.join(public_url, "healthcheck"))
-        healthcheck = response.read()
+        response = http_utils.get(env, os.path.join(public_url, "healthcheck"))
+        healthcheck = response.content
 
         if not healthcheck:
             get_message_error(os.path.join(public_url, "healthcheck") + " returned false.", demo)
@@ -60,7 +60,8 @@ def check_doc_serv_command_service(env, url, jwt_secret, jwt_header, demo):
             token = jwt_utils.encode_payload(env, body_json, jwt_secret)
             body_json["token"] = token
 
-        response = requests.post(
+        response = http_utils.post(
+            env,
             os.path.join(url, "coauthoring/CommandService.ashx"),
             data=json.dumps(body_json),
             headers=headers,
@@ -112,11 +113,13 @@ def convert(env, file_url, public_url, jwt_secret, jwt_header):
         body_json["token"] = token
 
     try:
-        response = requests.post(
-            os.path.join(public_url, "ConvertService.ashx"),
-            data = json.dumps(body_json),
-            headers = headers
-        )
+        with admission_utils.admit(env, "convert"):
+            response = http_utils.post(
+                env,
+                os.path.join(public_url, "ConvertService.ashx"),
+                data = json.dumps(body_json),
+                headers = headers
+            )
 
         if response.status_code == 200:
             response_json = response.json()
@@ -125,6 +128,8 @@ def convert(env, file_url, public_url, jwt_secret, jwt_header):
         else:
             return f"Document conversion service returned status {response.status_code}"
 
+    except admission_utils.AdmissionError as e:
+        return str(e)
     except:
         return "Document conversion service cannot be reached"
 
@@ -28,12 +28,7 @@ class OnlyofficeDocuments_Connector(http.Controller):
             _logger.info("Getting new file template %s %s" % (request.env.user.lang, format))
             file_data = file_utils.get_default_file_template(request.env.user.lang, format)
 
-            data = {
-                'name': title + "." + format,
-                'mimetype': file_utils.get_mime_by_ext(format),
-                'raw': file_data,
-                'folder_id': int(folder_id)
-            }
+            data = self.prepare_document_values(folder_id, format, title, file_data)
 
             document = request.env["documents.document"].create(data)
             result["file_id"] = document.attachment_id.id
@@ -44,6 +39,122 @@ class OnlyofficeDocuments_Connector(http.Controller):
 
         return json.dumps(result)
 
+    @http.route("/onlyoffice/documents/file/create_batch", auth="user", methods=["POST"], type="json")
+    def post_files_create(self, files):
+        # files is a list of {"folder_id", "format", "title"}, the results are returned in the same order
+        results = [{"error": None, "file_id": None} for _item in files]
+        templates = {}
+        vals_list = []
+        indexes = []
+
+        # a malformed item only fails itself, it is left out before the folders are checked
+        items = []
+        for index, item in enumerate(files):
+            try:
+                items.append((index, int(item["folder_id"]), item["format"], item["title"]))
+            except Exception as ex:
+                _logger.warning("Invalid document %s: %s" % (item, str(ex)))
+                results[index]["error"] = _("Failed to create document")
+
+        folders = request.env["documents.folder"].browse(list({item[1] for item in items})).exists()
+
+        for index, folder_id, format, title in items:
+            try:
+                if folder_id not in folders.ids:
+                    results[index]["error"] = _("Folder not found")
+                    continue
+
+                # every format is loaded once for the whole batch
+                if format not in templates:
+                    templates[format] = file_utils.get_default_file_template(request.env.user.lang, format)
+
+                vals_list.append(self.prepare_document_values(folder_id, format, title, templates[format]))
+                indexes.append(index)
+            except Exception as ex:
+                _logger.warning("Failed to prepare document %s: %s" % (files[index], str(ex)))
+                results[index]["error"] = _("Failed to create document")
+
+        if not vals_list:
+            return {"files": results}
+
+        Document = request.env["documents.document"]
+        try:
+            with request.env.cr.savepoint():
+                documents = Document.create(vals_list)
+            for index, document in zip(indexes, documents):
+                results[index]["file_id"] = document.attachment_id.id
+        except Exception as ex:
+            # one invalid item fails the whole create, the items are then created one by one to find it
+            _logger.warning("Failed to create documents in batch, creating them one by one: %s" % str(ex))
+            for index, data in zip(indexes, vals_list):
+                try:
+                    with request.env.cr.savepoint():
+                        results[index]["file_id"] = Document.create(data).attachment_id.id
+                except Exception as ex:
+                    _logger.warning("Failed to create document %s" % str(ex))
+                    results[index]["error"] = _("Failed to create document")
+
+        return {"files": results}
+
+    @http.route("/onlyoffice/documents/file/convert", auth="user", methods=["POST"], type="json")
+    def post_files_convert(self, document_ids, format):
+        # converted files are added next to their source once done, the client sends the pending ones again
+        Conversion = request.env["onlyoffice.conversion"]
+        documents = request.env["documents.document"].browse([int(document_id) for document_id in document_ids]).exists()
+        documents_by_id = {document.id: document for document in documents}
+
+        results = []
+        vals_list = []
+        indexes = []
+        for document_id in document_ids:
+            result = {"document_id": document_id, "file_id": None}
+            results.append(result)
+            try:
+                document = documents_by_id.get(int(document_id))
+                if not document or not document.attachment_id:
+                    result.update({"state": "failed", "error": _("Document not found")})
+                    continue
+
+                attachment = document.attachment_id
+                conversion = Conversion._request(attachment, format)
+                result.update(conversion._get_status(attachment))
+                if conversion.state == "done":
+                    result_attachment = conversion._create_result(attachment)
+                    vals_list.append({"attachment_id": result_attachment.id, "folder_id": document.folder_id.id})
+                    indexes.append(len(results) - 1)
+            except Exception as ex:
+                _logger.warning("Failed to convert document %s: %s" % (document_id, str(ex)))
+                result.update({"state": "failed", "error": _("Failed to convert document")})
+
+        if not vals_list:
+            return {"files": results}
+
+        Document = request.env["documents.document"]
+        try:
+            with request.env.cr.savepoint():
+                converted = Document.create(vals_list)
+            for index, document in zip(indexes, converted):
+                results[index]["file_id"] = document.attachment_id.id
+        except Exception as ex:
+            _logger.warning("Failed to create converted documents in batch, creating them one by one: %s" % str(ex))
+            for index, data in zip(indexes, vals_list):
+                try:
+                    with request.env.cr.savepoint():
+                        results[index]["file_id"] = Document.create(data).attachment_id.id
+                except Exception as ex:
+                    _logger.warning("Failed to create converted document %s" % str(ex))
+                    results[index].update({"state": "failed", "error": _("Failed to create document")})
+
+        return {"files": results}
+
+    def prepare_document_values(self, folder_id, format, title, file_data):
+        return {
+            'name': title + "." + format,
+            'mimetype': file_utils.get_mime_by_ext(format),
+            'raw': file_data,
+            'folder_id': int(folder_id)
+        }
+
 class OnlyofficeDocuments_Inherited_Connector(Onlyoffice_Connector):
     @http.route("/onlyoffice/editor/document/<int:document_id>", auth="public", type="http", website=True)
     def render_document_editor(self, document_id, access_token=None):
@@ -64,7 +175,9 @@ class OnlyofficeDocuments_Inherited_Connector(Onlyoffice_Connector):
         
         try:
             document.check_access_rule("write")
-            return self.prepare_editor_values(attachment, access_token, True)
+            can_write = True
         except AccessError:
             _logger.debug("Current user has no write access")
-            return self.prepare_editor_values(attachment, access_token, False)
\ No newline at end of file
+            can_write = False
+
+        return self.prepare_editor_values(attachment, access_token, can_write)
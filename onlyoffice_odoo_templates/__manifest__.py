@@ -20,6 +20,7 @@
     'data': [
         'security/onlyoffice_templates_security.xml',
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/onlyoffice_menu_views.xml'
     ],
 
@@ -1,3 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from . import onlyoffice_odoo_templates
\ No newline at end of file
+from . import onlyoffice_odoo_templates
+from . import onlyoffice_docbuilder_job
+from . import onlyoffice_template_cache
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import contextlib
+import functools
+import logging
+import shutil
+import zipfile
+
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.addons.onlyoffice_odoo.utils import admission_utils, config_utils, file_utils, http_utils, stream_utils, token_utils
+from odoo.addons.onlyoffice_odoo_templates.utils import docbuilder_utils, pdf_utils
+
+_logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+FIRST_POLL_DELAY = 1
+MAX_POLL_DELAY = 30
+JOB_TIMEOUT = 30 * 60
+DONE_JOBS_LIFETIME = 1
+
+
+class OnlyofficeDocbuilderJob(models.Model):
+    _name = "onlyoffice.docbuilder.job"
+    _description = "ONLYOFFICE Docbuilder Job"
+    _order = "id"
+
+    template_id = fields.Many2one("onlyoffice.odoo.templates", required=True, ondelete="cascade")
+    model_name = fields.Char(required=True)
+    output = fields.Selection([("pdf", "PDF"), ("zip", "ZIP")], default="pdf", required=True)
+    user_id = fields.Many2one("res.users", required=True, ondelete="cascade", default=lambda self: self.env.user)
+    state = fields.Selection(
+        [("queued", "Queued"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")],
+        default="queued",
+        required=True,
+        index=True,
+    )
+    line_ids = fields.One2many("onlyoffice.docbuilder.job.line", "job_id")
+    result_attachment_id = fields.Many2one("ir.attachment", ondelete="set null")
+    error = fields.Text()
+
+    @api.model
+    def _enqueue(self, template, model_name, record_ids, output="pdf"):
+        job = self.sudo().create({
+            "template_id": template.id,
+            "model_name": model_name,
+            "output": output,
+            "user_id": self.env.user.id,
+            "line_ids": [(0, 0, {"record_id": record_id, "sequence": index}) for index, record_id in enumerate(record_ids)],
+        })
+
+        # forms filled in process are ready before the request returns
+        if template._can_fill_natively():
+            try:
+                with self.env.cr.savepoint():
+                    job._next_chunk()._submit()
+                    job._finalize_if_complete()
+            except Exception as e:
+                _logger.warning("ONLYOFFICE docbuilder job %s could not be filled in process: %s", job.id, e)
+
+        if job.state not in ("done", "failed"):
+            self._trigger_cron()
+        return job
+
+    @api.model
+    def _trigger_cron(self, at=None):
+        self.env.ref("onlyoffice_odoo_templates.ir_cron_onlyoffice_docbuilder_jobs")._trigger(at)
+
+    def _get_status(self):
+        self.ensure_one()
+        counts = dict(self.env["onlyoffice.docbuilder.job.line"].sudo()._read_group(
+            [("job_id", "=", self.id)], ["state"], ["__count"],
+        ))
+        status = {
+            "job_id": self.id,
+            "state": self.state,
+            "total": sum(counts.values()),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+        }
+        if self.state == "done":
+            status["href"] = f"/web/content/{self.result_attachment_id.id}?download=true"
+            if self.error:
+                status["warning"] = self.error
+        elif self.state == "failed":
+            status["error"] = self.error or "Unknown error"
+        return status
+
+    def _get_records(self, record_ids):
+        return self.env[self.model_name].with_user(self.user_id).with_context(lang=self.user_id.lang).browse(record_ids).exists()
+
+    def _next_chunk(self):
+        # records of a failed chunk are sent again one by one, so one broken record does not fail the others
+        self.ensure_one()
+        pending_lines = self.line_ids.filtered(lambda line: line.state == "pending")
+        if not pending_lines or pending_lines[0].single:
+            return pending_lines[:1]
+        return pending_lines.filtered(lambda line: not line.single)[:config_utils.get_template_batch_size(self.env)]
+
+    @api.model
+    def _cron_process_jobs(self):
+        Line = self.env["onlyoffice.docbuilder.job.line"]
+        now = fields.Datetime.now()
+
+        for key in Line._get_running_keys([("next_poll", "<=", now)])[:BATCH_SIZE]:
+            lines = Line.search([("state", "=", "running"), ("docbuilder_key", "=", key)])
+            lines._run_step(lines._poll)
+
+        # every chunk takes a Document Server slot from admission_utils, which applies the global and per user
+        # limits to all calls; template_parallel_jobs only keeps some of the slots for the other calls
+        running = Line._get_running_users()
+        slots = config_utils.get_template_parallel_jobs(self.env) - sum(running.values())
+
+        jobs_by_user = {}
+        truncated = False
+        for (user,) in self._read_group([("state", "in", ("queued", "running"))], ["user_id"]):
+            jobs = self.search([("state", "in", ("queued", "running")), ("user_id", "=", user.id)], limit=BATCH_SIZE)
+            jobs_by_user[user.id] = list(jobs)
+            truncated = truncated or len(jobs) == BATCH_SIZE
+
+        # users take turns, the one with the fewest running builds first, so a bulk print does not take every slot
+        users = sorted(jobs_by_user, key=lambda user_id: (running.get(user_id, 0), jobs_by_user[user_id][0].id))
+        while slots > 0 and users:
+            for user_id in list(users):
+                if slots <= 0:
+                    break
+                if not self._submit_next_chunk(jobs_by_user[user_id]):
+                    users.remove(user_id)
+                    continue
+                running[user_id] = running.get(user_id, 0) + 1
+                slots -= 1
+
+        for jobs in jobs_by_user.values():
+            for job in jobs:
+                job._finalize_if_complete()
+                self.env.cr.commit()
+
+        # the cron is woken up again for the closest poll instead of waiting for its interval
+        if slots > 0 and truncated:
+            self._trigger_cron()
+        next_line = Line.search([("state", "=", "running")], order="next_poll", limit=1)
+        if next_line:
+            self._trigger_cron(next_line.next_poll)
+
+    @api.model
+    def _submit_next_chunk(self, jobs):
+        # returns whether a chunk was sent to Document Server, chunks filled in process do not take a slot
+        for job in jobs:
+            chunk = job._next_chunk()
+            while chunk:
+                admitted = chunk._run_step(chunk._submit)
+                if any(line.state == "running" for line in chunk):
+                    return True
+                if admitted is False:
+                    return False  # no free slot for this user, the chunk stays pending
+                chunk = job._next_chunk()
+        return False
+
+    def _finalize_if_complete(self):
+        self.ensure_one()
+        if self.state in ("done", "failed"):
+            return
+        if any(line.state in ("pending", "running") for line in self.line_ids):
+            if self.state == "queued":
+                self.state = "running"
+            return
+
+        try:
+            with self.env.cr.savepoint():
+                self._finalize()
+        except Exception as e:
+            _logger.warning("ONLYOFFICE docbuilder job %s failed: %s", self.id, e)
+            self.write({"state": "failed", "error": str(e)})
+
+    def _finalize(self):
+        done_lines = self.line_ids.filtered(lambda line: line.state == "done" and line.attachment_id)
+        failed_lines = self.line_ids - done_lines
+
+        if not done_lines:
+            self.write({"state": "failed", "error": failed_lines[:1].error or "Unknown error"})
+            return
+
+        files = done_lines.attachment_id
+        if self.output == "pdf" and len(files) == 1:
+            result = files
+        else:
+            # the documents are read from the filestore and the result is built in a spool, not in memory
+            template_name = self.template_id.display_name or "Filled Template"
+            with stream_utils.new_spool() as spool:
+                if self.output == "zip":
+                    names = set()
+                    with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                        for line in done_lines:
+                            name = line.attachment_id.name
+                            if name in names:
+                                name = f"{name[:-4]} ({line.record_id}).pdf"
+                            names.add(name)
+                            with stream_utils.open_attachment(line.attachment_id) as source, archive.open(name, "w") as target:
+                                shutil.copyfileobj(source, target, stream_utils.CHUNK_SIZE)
+                    mimetype = "application/zip"
+                else:
+                    with contextlib.ExitStack() as stack:
+                        sources = [stack.enter_context(stream_utils.open_attachment(line.attachment_id)) for line in done_lines]
+                        pdf_utils.merge_pdf_files(sources, spool)
+                    mimetype = file_utils.get_mime_by_ext("pdf")
+
+                checksum, size = stream_utils.hash_spool(spool)
+                result = self._create_attachment(f"{template_name}.{self.output}", None, mimetype)
+                stream_utils.write_attachment(result, spool, checksum, size, mimetype)
+            done_lines.attachment_id = False
+            files.unlink()
+
+        error = False
+        if failed_lines:
+            error = _("%(failed)s of %(total)s documents could not be generated", failed=len(failed_lines), total=len(self.line_ids))
+        self.write({"state": "done", "result_attachment_id": result.id, "error": error})
+
+    def _create_attachment(self, name, raw, mimetype):
+        # linked to the job, so the user who started it can download the result, the content of a
+        # large result is written afterwards with stream_utils.write_attachment
+        values = {
+            "name": name,
+            "mimetype": mimetype,
+            "res_model": self._name,
+            "res_id": self.id,
+        }
+        if raw is not None:
+            values["raw"] = raw
+        return self.env["ir.attachment"].sudo().create(values)
+
+    @api.autovacuum
+    def _gc_finished_jobs(self):
+        limit_date = fields.Datetime.now() - timedelta(days=DONE_JOBS_LIFETIME)
+        jobs = self.search([("state", "in", ("done", "failed")), ("write_date", "<", limit_date)])
+        self.env["ir.attachment"].sudo().search([("res_model", "=", self._name), ("res_id", "in", jobs.ids)]).unlink()
+        jobs.unlink()
+
+
+class OnlyofficeDocbuilderJobLine(models.Model):
+    _name = "onlyoffice.docbuilder.job.line"
+    _description = "ONLYOFFICE Docbuilder Job Record"
+    _order = "sequence, id"
+
+    job_id = fields.Many2one("onlyoffice.docbuilder.job", required=True, ondelete="cascade", index=True)
+    record_id = fields.Integer(required=True)
+    sequence = fields.Integer(default=0)
+    state = fields.Selection(
+        [("pending", "Pending"), ("running", "Running"), ("done", "Done"), ("failed", "Failed")],
+        default="pending",
+        required=True,
+        index=True,
+    )
+    single = fields.Boolean()
+    docbuilder_key = fields.Char(index=True)
+    polls = fields.Integer(default=0)
+    next_poll = fields.Datetime()
+    started_at = fields.Datetime()
+    cache_key = fields.Char()
+    # id of the admitted onlyoffice.admission.ticket shared by the lines of a chunk
+    admission_ticket = fields.Integer(copy=False)
+    attachment_id = fields.Many2one("ir.attachment", ondelete="set null")
+    error = fields.Text()
+
+    @api.model
+    def _get_running_keys(self, domain=None):
+        groups = self._read_group([("state", "=", "running")] + (domain or []), ["docbuilder_key"])
+        return [key for (key,) in groups if key]
+
+    @api.model
+    def _get_running_users(self):
+        # number of docbuilder jobs running on Document Server per user
+        running = {}
+        for job, key in self._read_group([("state", "=", "running")], ["job_id", "docbuilder_key"]):
+            if key:
+                running[job.user_id.id] = running.get(job.user_id.id, 0) + 1
+        return running
+
+    def _run_step(self, step):
+        # the lines of one step belong to the same job and share one docbuilder job
+        result = None
+        try:
+            with self.env.cr.savepoint():
+                result = step()
+        except Exception as e:
+            _logger.warning("ONLYOFFICE docbuilder job %s failed for records %s: %s", self.job_id.id, self.mapped("record_id"), e)
+            self._fail(str(e))
+        # every step is kept, even if a later step of the batch breaks the transaction
+        self.env.cr.commit()
+        return result
+
+    def _release_slot(self):
+        ticket_ids = {ticket_id for ticket_id in self.mapped("admission_ticket") if ticket_id}
+        if not ticket_ids:
+            return
+        self.write({"admission_ticket": 0})
+        for ticket_id in ticket_ids:
+            admission_utils.release(self.env, ticket_id)
+        # a queued chunk can take the slot
+        self.env["onlyoffice.docbuilder.job"]._trigger_cron()
+
+    def _fail(self, error):
+        self._release_slot()
+        if len(self) > 1:
+            self.write({"state": "pending", "single": True, "docbuilder_key": False})
+        else:
+            self.write({"state": "failed", "error": error, "docbuilder_key": False})
+
+    def _submit(self):
+        job = self.job_id
+        template = job.template_id.with_user(job.user_id)
+
+        # the keys are refreshed here, so the fill callback never has to call docbuilder itself
+        template._get_form_keys()
+
+        records = job._get_records(self.mapped("record_id"))
+        lines = self._set_missing_records_failed(records)
+
+        # documents already generated for the same template, record state and user are not sent again
+        Cache = self.env["onlyoffice.template.cache"]
+        cache_keys = Cache._get_keys(template, records)
+        cache_hits = Cache._lookup(cache_keys)
+        for line in lines:
+            line.cache_key = cache_keys.get(line.record_id)
+            entry = cache_hits.get(line.record_id)
+            if entry:
+                line._set_done(entry.attachment_id.name, entry.attachment_id.raw, cached=True)
+
+        lines = lines.filtered(lambda line: line.state == "pending")
+        if not lines:
+            return
+
+        records = records.browse(lines.mapped("record_id"))
+        if template._can_fill_natively():
+            results = template._fill_natively(records)
+            for line, filename in zip(lines, template._get_filenames(records)):
+                if filename in results:
+                    line._set_done(filename, results[filename])
+
+            lines = lines.filtered(lambda line: line.state == "pending")
+            if not lines:
+                return
+            records = records.browse(lines.mapped("record_id"))
+
+        odoo_url = config_utils.get_base_or_odoo_url(self.env)
+        oo_security_token = token_utils.issue_security_token(self.env, job.user_id.id)
+        record_ids = ",".join(str(record_id) for record_id in records.ids)
+        callback_url = f"{odoo_url}onlyoffice/template/callback/fill_templates?template_id={template.id}&record_ids={record_ids}&model_name={job.model_name}&oo_security_token={oo_security_token}"
+
+        ticket_id = admission_utils.take_slot(self.env, "docbuilder", job.user_id.id)
+        if not ticket_id:
+            return False
+
+        # the ticket is committed on its own cursor, it is released if the chunk is never started
+        try:
+            key = docbuilder_utils.submit(self.env, callback_url)
+            if not key:
+                raise UserError(_("Document Server did not return a job key"))
+        except Exception:
+            admission_utils.release(self.env, ticket_id)
+            raise
+        self.env.cr.postrollback.add(functools.partial(admission_utils.release, self.env, ticket_id))
+
+        now = fields.Datetime.now()
+        lines.write({
+            "state": "running",
+            "docbuilder_key": key,
+            "admission_ticket": ticket_id,
+            "polls": 0,
+            "next_poll": now + timedelta(seconds=FIRST_POLL_DELAY),
+            "started_at": now,
+        })
+
+    def _set_missing_records_failed(self, records):
+        missing_lines = self.filtered(lambda line: line.record_id not in records.ids)
+        missing_lines.write({"state": "failed", "error": _("Record not found"), "docbuilder_key": False})
+        return self - missing_lines
+
+    def _poll(self):
+        end, urls = docbuilder_utils.poll(self.env, self[0].docbuilder_key)
+        if end:
+            self._collect(urls)
+            return
+
+        now = fields.Datetime.now()
+        if now - self[0].started_at > timedelta(seconds=JOB_TIMEOUT):
+            raise UserError(_("Document generation timed out"))
+
+        polls = self[0].polls + 1
+        self.write({
+            "polls": polls,
+            "next_poll": now + timedelta(seconds=min(FIRST_POLL_DELAY * 2 ** polls, MAX_POLL_DELAY)),
+        })
+
+    def _collect(self, urls):
+        job = self.job_id
+        template = job.template_id.with_user(job.user_id)
+        records = job._get_records(self.mapped("record_id"))
+        lines = self._set_missing_records_failed(records)
+
+        # docbuilder names the results after the records it was given
+        filenames = dict(zip(records.ids, template._get_filenames(records)))
+        for line in lines:
+            filename = filenames[line.record_id]
+            file_url = urls.get(filename)
+            if not file_url:
+                line.write({"state": "failed", "error": _("Missing result for %s", filename), "docbuilder_key": False})
+                continue
+
+            response = http_utils.get(self.env, file_url)
+            response.raise_for_status()
+            line._set_done(filename, response.content)
+
+        self._release_slot()
+
+    def _set_done(self, filename, raw, cached=False):
+        self.ensure_one()
+        job = self.job_id
+
+        if self.cache_key and not cached:
+            self.env["onlyoffice.template.cache"]._store(job.template_id, job.user_id, self.cache_key, filename, raw)
+
+        self.write({
+            "state": "done",
+            "docbuilder_key": False,
+            "attachment_id": job._create_attachment(filename, raw, file_utils.get_mime_by_ext("pdf")).id,
+        })
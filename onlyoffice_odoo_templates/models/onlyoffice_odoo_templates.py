@@ -1,15 +1,24 @@
 import base64
 import copy
 import json
+import logging
 import re
 import os
 
-from odoo import _, api, fields, models
+from datetime import timedelta
+
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import UserError
-from odoo.addons.onlyoffice_odoo.utils import file_utils
-from odoo.addons.onlyoffice_odoo_templates.utils import pdf_utils
+from odoo.tools import get_lang
+from odoo.addons.onlyoffice_odoo.utils import file_utils, stream_utils, token_utils
+from odoo.addons.onlyoffice_odoo_templates.utils import docbuilder_utils, fields_utils, pdf_utils
 from odoo.modules import get_module_path
 
+_logger = logging.getLogger(__name__)
+
+FIELDS_DATA_PREFIX = "onlyoffice_template_data_"
+FIELDS_DATA_LIFETIME = 1
+
 class OnlyOfficeTemplate(models.Model):
     _name = "onlyoffice.odoo.templates"
     _description = "ONLYOFFICE Templates"
@@ -21,6 +30,9 @@ class OnlyOfficeTemplate(models.Model):
     file = fields.Binary(string="Upload an existing template")
     attachment_id = fields.Many2one("ir.attachment", readonly=True)
     mimetype = fields.Char(default="application/pdf")
+    form_keys = fields.Text(readonly=True, copy=False)
+    form_keys_checksum = fields.Char(readonly=True, copy=False)
+    native_fill = fields.Boolean(readonly=True, copy=False)
 
     @api.onchange("name")
     def _onchange_name(self):
@@ -31,13 +43,12 @@ class OnlyOfficeTemplate(models.Model):
     @api.onchange("file")
     def _onchange_file(self):
         if self.file and self.create_date: # if file exist
-            decode_file = base64.b64decode(self.file)
-            is_pdf_form = pdf_utils.is_pdf_form(decode_file)
-            if not is_pdf_form:
-                self.file = False
-                raise UserError(_("Only PDF Form can be uploaded."))
+            # the upload is checked once stored, the error rolls the new content back
             self.attachment_id.datas = self.file
             self.file = False
+            if not pdf_utils.is_pdf_form_attachment(self.attachment_id):
+                raise UserError(_("Only PDF Form can be uploaded."))
+            self._origin._schedule_form_keys_update()
 
     @api.model
     def _create_demo_data(self):
@@ -74,12 +85,7 @@ class OnlyOfficeTemplate(models.Model):
 
     @api.model
     def create(self, vals):
-        if vals.get("file"):
-            decode_file = base64.b64decode(vals.get("file"))
-            is_pdf_form = pdf_utils.is_pdf_form(decode_file)
-            if not is_pdf_form:
-                raise UserError(_("Only PDF Form can be uploaded."))
-
+        uploaded = bool(vals.get("file"))
         file = vals.get("file") or base64.encodebytes(file_utils.get_default_file_template(self.env.user.lang, "pdf"))
         mimetype = file_utils.get_mime_by_ext("pdf")
 
@@ -99,99 +105,179 @@ class OnlyOfficeTemplate(models.Model):
                     "res_id": record.id,
                 }
             )
+            # the upload is checked once stored, the error rolls the record back
+            if uploaded and not pdf_utils.is_pdf_form_attachment(attachment):
+                raise UserError(_("Only PDF Form can be uploaded."))
             record.attachment_id = attachment.id
+            record._schedule_form_keys_update()
         return record
 
+    def _get_form_keys(self):
+        self.ensure_one()
+        checksum = self.attachment_id.checksum
+        if self.form_keys and self.form_keys_checksum == checksum:
+            return json.loads(self.form_keys)
+
+        oo_security_token = token_utils.issue_security_token(self.env, self.env.user.id)
+        keys = docbuilder_utils.get_form_keys(self.env, self.attachment_id.id, oo_security_token)
+
+        self.sudo().write({
+            "form_keys": json.dumps(keys),
+            "form_keys_checksum": checksum,
+            "native_fill": self._is_native_fill_supported(keys),
+        })
+        return keys
+
+    def _is_native_fill_supported(self, keys):
+        # tables, lists and images are only filled by docbuilder, flat text forms are filled in process
+        if not keys or any(" " in key for key in keys):
+            return False
+
+        model = self.env.get(self.template_model_model)
+        if model is None or any(model._fields[key].type == "binary" for key in keys if key in model._fields):
+            return False
+
+        try:
+            field_types = pdf_utils.get_form_field_types(self.attachment_id.raw)
+        except Exception as e:
+            _logger.warning("Failed to read form fields of template %s: %s", self.id, e)
+            return False
+
+        return bool(field_types) and all(field_type == pdf_utils.TEXT_FIELD for field_type in field_types.values())
+
+    def _can_fill_natively(self):
+        self.ensure_one()
+        return bool(self.native_fill and self.form_keys_checksum == self.attachment_id.checksum)
+
+    def _fill_natively(self, records):
+        # returns the filled documents by file name, the same names docbuilder would give them,
+        # records with text the standard PDF fonts cannot draw are left out for docbuilder
+        keys = self._get_form_keys()
+        records_fields = fields_utils.get_records_fields(records, keys, get_lang(records.env))
+        data = self.attachment_id.raw
+
+        results = {}
+        for record, filename in zip(records, self._get_filenames(records)):
+            record_fields = records_fields.get(record.id) or {}
+            values = {key: pdf_utils.to_text_value(record_fields.get(key)) for key in keys}
+            try:
+                results[filename] = pdf_utils.fill_form(data, values)
+            except pdf_utils.UnsupportedTextError as e:
+                _logger.debug("Template %s is filled by docbuilder for %s: %s", self.id, record, e)
+        return results
+
+    def _get_filenames(self, records):
+        self.ensure_one()
+        template_name = self.display_name or self.name or "Filled Template"
+
+        filenames = []
+        for record in records:
+            record_name = getattr(record, "display_name", getattr(record, "name", str(record.id)))
+            filename = re.sub(r"[<>:'/\\|?*\x00-\x1f]", " ", f"{template_name} - {record_name}")
+            if f"{filename}.pdf" in filenames:
+                filename = f"{filename} ({record.id})"
+            filenames.append(f"{filename}.pdf")
+
+        return filenames
+
+    def _store_fields_pages(self, record, pages):
+        # one text attachment per record, the script reads every page by its offset and length
+        self.ensure_one()
+        attachment = self.env["ir.attachment"].sudo().create({
+            "name": f"{FIELDS_DATA_PREFIX}{record._name}_{record.id}.txt",
+            "mimetype": "text/plain",
+            "res_model": self._name,
+            "res_id": self.id,
+        })
+        stream_utils.write_attachment(attachment, pages.file, pages.checksum, pages.file_size, "text/plain")
+        return attachment
+
     @api.model
-    def get_fields_for_model(self, model_name):
-        processed_models = set()
-        cached_models = {}
+    def _read_fields_page(self, attachment, offset, length):
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), "rb") as file:
+                file.seek(offset)
+                return file.read(length)
+        return attachment.raw[offset:offset + length]
 
-        def process_model(model_name):
-            if model_name in processed_models:
-                return {}
+    @api.model
+    def _is_fields_data(self, attachment):
+        return attachment.res_model == self._name and (attachment.name or "").startswith(FIELDS_DATA_PREFIX)
 
-            processed_models.add(model_name)
+    @api.autovacuum
+    def _gc_fields_data(self):
+        limit_date = fields.Datetime.now() - timedelta(days=FIELDS_DATA_LIFETIME)
+        self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", self._name),
+            ("name", "=like", FIELDS_DATA_PREFIX + "%"),
+            ("create_date", "<", limit_date),
+        ]).unlink()
 
-            model = self.env["ir.model"].search([("model", "=", model_name)], limit=1)
-            if not model:
-                processed_models.discard(model_name)
-                return {}
-            description = model.name
+    def _schedule_form_keys_update(self):
+        # Document Server downloads the template from Odoo, so the keys are extracted by the cron once it is committed
+        self.env.ref("onlyoffice_odoo_templates.ir_cron_onlyoffice_form_keys")._trigger()
 
-            fields = self.env[model_name].fields_get([], attributes=("name", "type", "string", "relation"))
+    @api.model
+    def _cron_update_form_keys(self):
+        templates = self.search([("attachment_id", "!=", False)])
+        for template in templates.filtered(lambda template: template.form_keys_checksum != template.attachment_id.checksum):
+            try:
+                template._get_form_keys()
+            except Exception as e:
+                _logger.warning("Failed to extract form keys of template %s: %s", template.id, e)
+                break  # Document Server is unavailable, the keys are extracted on the next fill
+            self.env.cr.commit()
 
-            form_fields = self.env[model_name].get_view()['models']
-            form_fields = form_fields[model_name]
+    @api.model
+    @tools.ormcache("model_name", "self.env.lang", "tuple(self.env.user.groups_id.ids)")
+    def _get_model_fields_descriptor(self, model_name):
+        # the cache lives in the registry, so it is rebuilt after a module install or upgrade
+        model = self.env["ir.model"].search([("model", "=", model_name)], limit=1)
+        if not model:
+            return None
 
-            field_list = []
-            for field_name, field_props in fields.items():
-                field_type = field_props["type"]
+        fields = self.env[model_name].fields_get([], attributes=("name", "type", "string", "relation"))
 
-                if field_type in ["one2many", "many2many", "many2one"] and field_name not in form_fields:
-                    continue
+        form_fields = self.env[model_name].get_view()['models']
+        form_fields = form_fields[model_name]
 
-                if field_type in ["html", "json"]:
-                    continue  # TODO:
+        return (
+            model.name,
+            tuple(
+                (field_name, field_props.get("string", ""), field_props["type"], field_props.get("relation"), field_name in form_fields)
+                for field_name, field_props in fields.items()
+            ),
+        )
 
-                field_dict = {
-                    "name": field_name,
-                    "string": field_props.get("string", ""),
-                    "type": field_props["type"],
-                }
+    @api.model
+    def get_model_fields(self, model_name):
+        descriptor = self._get_model_fields_descriptor(model_name)
+        if not descriptor:
+            return json.dumps({})
+        description, fields = descriptor
+
+        field_list = []
+        for field_name, field_string, field_type, relation, in_form in fields:
+            if field_type in fields_utils.RELATIONAL_TYPES and not in_form:
+                continue
+
+            # fields_utils does not fill these types, so the editor does not offer them
+            if field_type in fields_utils.SKIPPED_TYPES:
+                continue
 
-                if field_type in ["one2many", "many2many", "many2one"]:
-                    related_model = field_props["relation"]
-                    if cached_models.get(related_model):
-                        field_dict["related_model"] = {
-                            "name": field_name,
-                            "description": cached_models[related_model]["description"],
-                            "fields": cached_models[related_model]["fields"],
-                        }
-                    else:
-                        if field_type == "many2one":
-                            related_description = self.env["ir.model"].search([("model", "=", related_model)], limit=1)
-                            related_description = related_description.name
-                            related_fields = self.env[related_model].fields_get([], attributes=("name", "type", "string"))
-                            related_form_fields = self.env[related_model].get_view()['models']
-                            related_form_fields = related_form_fields[related_model]
-                            related_field_list = []
-                            for (related_field_name, related_field_props) in related_fields.items():
-                                if related_field_props["type"] in ["html", "json"]:
-                                    continue  # TODO:
-                                if related_field_name not in related_form_fields:
-                                    continue
-                                related_field_dict = {
-                                    "name": related_field_name,
-                                    "string": related_field_props.get("string", ""),
-                                    "type": related_field_props["type"],
-                                }
-                                related_field_list.append(related_field_dict)
-                            related_model_info = {
-                                "name": field_name,
-                                "description": related_description,
-                                "fields": related_field_list,
-                            }
-                            if related_field_list:
-                                field_dict["related_model"] = related_model_info
-                            cached_models[related_model] = related_model_info
-                        else:
-                            processed_model = process_model(related_model)
-                            if processed_model:
-                                field_dict["related_model"] = processed_model
-                                cached_models[related_model] = processed_model
-
-                field_list.append(field_dict)
-
-            model_info = {
-                "name": model_name,
-                "description": description,
-                "fields": field_list,
+            field_dict = {
+                "name": field_name,
+                "string": field_string,
+                "type": field_type,
             }
+            if field_type in fields_utils.RELATIONAL_TYPES:
+                field_dict["relation"] = relation
 
-            processed_models.discard(model_name)
-            return model_info
+            field_list.append(field_dict)
 
-        models_info = process_model(model_name)
-        data = json.dumps(models_info, ensure_ascii=False)
-        return data
\ No newline at end of file
+        data = {
+            "name": model_name,
+            "description": description,
+            "fields": field_list,
+        }
+        return json.dumps(data, ensure_ascii=False)
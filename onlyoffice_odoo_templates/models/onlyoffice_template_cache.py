@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import hashlib
+import json
+
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.addons.onlyoffice_odoo.utils import config_utils, file_utils
+from odoo.addons.onlyoffice_odoo_templates.utils import fields_utils
+
+
+class OnlyofficeTemplateCache(models.Model):
+    _name = "onlyoffice.template.cache"
+    _description = "ONLYOFFICE Filled Template Cache"
+    _order = "last_used desc, id desc"
+
+    key = fields.Char(required=True, index=True)
+    template_id = fields.Many2one("onlyoffice.odoo.templates", required=True, ondelete="cascade")
+    user_id = fields.Many2one("res.users", required=True, ondelete="cascade")
+    attachment_id = fields.Many2one("ir.attachment", required=True, ondelete="cascade")
+    file_size = fields.Integer()
+    last_used = fields.Datetime(default=fields.Datetime.now, index=True)
+
+    _sql_constraints = [
+        ("key_uniq", "unique(key)", "A cached document with this key already exists."),
+    ]
+
+    @api.model
+    def _get_keys(self, template, records):
+        # template and records carry the env of the printing user, the key depends on what the fill reads
+        if not config_utils.is_template_cache_enabled(self.env):
+            return {}
+
+        checksum = template.attachment_id.checksum
+        if not template.form_keys or template.form_keys_checksum != checksum:
+            return {}
+
+        versions = fields_utils.get_records_versions(records, json.loads(template.form_keys))
+
+        keys = {}
+        for record in records:
+            data = json.dumps([checksum, records._name, record.id, records.env.uid, records.env.lang, versions.get(record.id)])
+            keys[record.id] = hashlib.sha1(data.encode()).hexdigest()
+        return keys
+
+    @api.model
+    def _lookup(self, keys):
+        if not keys:
+            return {}
+
+        entries = self.sudo().search([("key", "in", list(keys.values()))])
+        if entries:
+            entries.write({"last_used": fields.Datetime.now()})
+
+        entries_by_key = {entry.key: entry for entry in entries}
+        return {record_id: entries_by_key[key] for record_id, key in keys.items() if key in entries_by_key}
+
+    @api.model
+    def _store(self, template, user, key, filename, raw):
+        Cache = self.sudo()
+        if Cache.search_count([("key", "=", key)], limit=1):
+            return
+
+        entry = Cache.create({
+            "key": key,
+            "template_id": template.id,
+            "user_id": user.id,
+            "attachment_id": self.env["ir.attachment"].sudo().create({
+                "name": filename,
+                "raw": raw,
+                "mimetype": file_utils.get_mime_by_ext("pdf"),
+                "res_model": self._name,
+            }).id,
+            "file_size": len(raw),
+        })
+        entry.attachment_id.res_id = entry.id
+
+    def _get_href(self):
+        self.ensure_one()
+        return f"/onlyoffice/template/cache/{self.id}"
+
+    def unlink(self):
+        attachments = self.attachment_id
+        res = super().unlink()
+        attachments.sudo().unlink()
+        return res
+
+    @api.autovacuum
+    def _gc_cache(self):
+        ttl, size = config_utils.get_template_cache_limits(self.env)
+        self.search([("last_used", "<", fields.Datetime.now() - timedelta(seconds=ttl))]).unlink()
+
+        # the least recently used documents are dropped once the size budget is exceeded
+        total_size = 0
+        evicted = self.browse()
+        for entry in self.search([]):
+            total_size += entry.file_size
+            if total_size > size:
+                evicted |= entry
+        evicted.unlink()
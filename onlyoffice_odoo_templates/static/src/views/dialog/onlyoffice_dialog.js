@@ -32,6 +32,7 @@ export class TemplateDialog extends Component {
       selectedTemplateId: null,
       currentOffset: 0,
       isProcessing: false,
+      progress: null,
     });
 
     useSubEnv({
@@ -98,21 +99,38 @@ export class TemplateDialog extends Component {
     }
   }
 
-  async fillTemplate() {
+  async fillTemplate(output = "pdf") {
     this.state.isProcessing = true;
 
     const templateId = this.state.selectedTemplateId;
-    const { resId, resModel } = this.props;
+    const { resId, resIds, resModel } = this.props;
+
+    let response;
+    if (resIds && resIds.length > 1) {
+      response = await this.rpc("/onlyoffice/template/get_filled_templates", {
+        template_id: templateId,
+        record_ids: resIds,
+        model_name: resModel,
+        output: output,
+      });
+    } else {
+      response = await this.rpc("/onlyoffice/template/get_filled_template", {
+        template_id: templateId,
+        record_id: resId || (resIds && resIds[0]),
+        model_name: resModel,
+      });
+    }
 
-    const response = await this.rpc("/onlyoffice/template/get_filled_template", {
-      template_id: templateId,
-      record_id: resId,
-      model_name: resModel,
-    });
+    if (response && response.job_id && !response.href && !response.error) {
+      response = await this.waitForJob(response.job_id);
+    }
 
     if (!response) {
       this.notificationService.add(_t("Unknown error"), { type: "danger" });
     } else if (response.href) {
+      if (response.warning) {
+        this.notificationService.add(response.warning, { type: "warning" });
+      }
       window.location.href = response.href;
     } else if (response.error) {
       this.notificationService.add(_t(response.error), { type: "danger" });
@@ -120,6 +138,26 @@ export class TemplateDialog extends Component {
     this.data.close();
   }
 
+  isMultiple() {
+    return Boolean(this.props.resIds && this.props.resIds.length > 1);
+  }
+
+  async waitForJob(jobId) {
+    // the document is generated in the background, the delay grows up to 5 seconds
+    let delay = 500;
+    for (;;) {
+      await new Promise((resolve) => setTimeout(resolve, delay));
+      const status = await this.rpc(`/onlyoffice/template/job/${jobId}`, {});
+      if (!status || status.href || status.error) {
+        return status;
+      }
+      if (status.total > 1) {
+        this.state.progress = `${status.done + status.failed} / ${status.total}`;
+      }
+      delay = Math.min(delay * 2, 5000);
+    }
+  }
+
   selectTemplate(templateId) {
     this.state.selectedTemplateId = templateId;
   }
@@ -3,7 +3,7 @@
 import { registry } from "@web/core/registry";
 import { useBus, useService } from "@web/core/utils/hooks";
 import { cookie } from "@web/core/browser/cookie";
-import { EditorComponent } from "./onlyoffice_editor_component";
+import { EditorComponent, formatFields } from "./onlyoffice_editor_component";
 
 import { _t } from "@web/core/l10n/translation";
 
@@ -49,8 +49,9 @@ class TemplateEditor extends Component {
           history.replaceState(null, null, newUrl);
         }
 
+        // only the fields of the template model are loaded, relations are loaded when they are expanded
         const models = JSON.parse(
-          await this.orm.call("onlyoffice.odoo.templates", "get_fields_for_model", [template_model_model]),
+          await this.orm.call("onlyoffice.odoo.templates", "get_model_fields", [template_model_model]),
         );
 
         // Add keys to field
@@ -125,30 +126,16 @@ class TemplateEditor extends Component {
     });
   }
 
-  formatModels(models, parentNames = []) {
+  formatModels(models) {
     if (!models.fields) return models;
-    models.fields = models.fields.map((field) => {
-      const key = [...parentNames, field.name].join(" ");
-      field.key = key;
-      if (field.related_model) {
-        field.related_model = this.formatModels(field.related_model, [...parentNames, field.name]);
-      }
-      return field;
-    }).sort((a, b) => {
-      if (a.related_model && !b.related_model) {
-        return -1;
-      }
-      if (!a.related_model && b.related_model) {
-        return 1;
-      }
-      return a.key.localeCompare(b.key);
-    });
+    models.fields = formatFields(models.fields, { path: [], ancestors: [models.name], type: null });
     return models;
   }
 
   setModelsFilter() {
+    // relations that were not expanded yet are only matched by their own name
     const searchAndExpand = (models) => {
-      if (!models.fields) return;
+      if (!models.fields) return null;
       const searchString = this.state.searchString.toLowerCase();
       const filteredFields = models.fields.filter(field => {
         if (field.key.split(' ').pop().toLowerCase().includes(searchString)) {
@@ -1,14 +1,52 @@
 /** @odoo-module **/
 import { Component, useState } from "@odoo/owl";
+import { useService } from "@web/core/utils/hooks";
+
+// relations are loaded one level at a time, when they are expanded
+export function formatFields(fields, parent) {
+  return fields
+    .filter((field) => !field.relation || (parent.type !== "many2one" && !parent.ancestors.includes(field.relation)))
+    .map((field) => {
+      const path = [...parent.path, field.name];
+      const formatted = { ...field, key: path.join(" ") };
+      if (field.relation) {
+        formatted.related_model = {
+          name: field.name,
+          description: field.string,
+          relation: field.relation,
+          type: field.type,
+          path,
+          ancestors: [...parent.ancestors, field.relation],
+          fields: null,
+        };
+      }
+      return formatted;
+    })
+    .sort((a, b) => {
+      if (a.related_model && !b.related_model) {
+        return -1;
+      }
+      if (!a.related_model && b.related_model) {
+        return 1;
+      }
+      return a.key.localeCompare(b.key);
+    });
+}
 
 export class EditorComponent extends Component {
   setup() {
+    this.orm = useService("orm");
     this.state = useState({
       isExpanded: false
     });
   }
-  toggleExpand() {
+  async toggleExpand() {
     this.state.isExpanded = !this.state.isExpanded;
+    const model = this.props.model;
+    if (this.state.isExpanded && !model.fields && model.relation) {
+      const data = JSON.parse(await this.orm.call("onlyoffice.odoo.templates", "get_model_fields", [model.relation]));
+      model.fields = formatFields(data.fields || [], model);
+    }
   }
 
   onFieldClick(field) {
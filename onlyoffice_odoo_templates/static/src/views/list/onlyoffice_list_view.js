@@ -0,0 +1,54 @@
+/** @odoo-module **/
+import { ListController } from "@web/views/list/list_controller";
+import { patch } from "@web/core/utils/patch";
+import { useService } from "@web/core/utils/hooks";
+import { TemplateDialog } from "../dialog/onlyoffice_dialog";
+import { _t } from "@web/core/l10n/translation";
+import { onWillStart } from "@odoo/owl";
+
+// whether a model has templates, asked once per model for the whole session
+const templateModels = new Map();
+
+function hasTemplates(orm, resModel) {
+  if (!templateModels.has(resModel)) {
+    const request = orm
+      .searchCount("onlyoffice.odoo.templates", [["template_model_model", "=", resModel]])
+      .then((count) => count > 0)
+      .catch(() => {
+        templateModels.delete(resModel);
+        return false;
+      });
+    templateModels.set(resModel, request);
+  }
+  return templateModels.get(resModel);
+}
+
+patch(ListController.prototype, {
+  setup() {
+    super.setup(...arguments);
+    this.onlyofficeOrm = useService("orm");
+    this.hasOnlyofficeTemplates = false;
+    // the action is only offered on models that have templates
+    onWillStart(async () => {
+      this.hasOnlyofficeTemplates = await hasTemplates(this.onlyofficeOrm, this.props.resModel);
+    });
+  },
+
+  getStaticActionMenuItems() {
+    const menuItems = super.getStaticActionMenuItems(...arguments);
+    menuItems.printWithOnlyoffice = {
+      isAvailable: () => this.hasOnlyofficeTemplates && this.model.root.selection.length > 0,
+      sequence: 60,
+      icon: "fa fa-print",
+      description: _t("Print with ONLYOFFICE"),
+      callback: async () => {
+        const resIds = await this.model.root.getResIds(true);
+        this.env.services.dialog.add(TemplateDialog, {
+          resIds: resIds,
+          resModel: this.props.resModel,
+        });
+      },
+    }
+    return menuItems
+  }
+});
@@ -0,0 +1,82 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import codecs
+import json
+
+from odoo.addons.onlyoffice_odoo.utils import admission_utils, config_utils, http_utils, jwt_utils
+
+DOCBUILDER_MESSAGES = {
+    -1: "Unknown error.",
+    -2: "Generation timeout error.",
+    -3: "Document generation error.",
+    -4: "Error while downloading the document file to be generated.",
+    -6: "Error while accessing the document generation result database.",
+    -8: "Invalid token.",
+}
+
+
+class DocbuilderError(Exception):
+    def __init__(self, code):
+        self.code = code
+        super().__init__(get_error_message(code))
+
+
+def get_error_message(error_code):
+    return DOCBUILDER_MESSAGES.get(error_code, "Error code not recognized.")
+
+
+def post(env, payload):
+    settings = config_utils.get_settings(env)
+
+    headers = {"Content-Type": "application/json", "Accept": "application/json"}
+
+    if settings.jwt_secret:
+        payload["token"] = jwt_utils.encode_payload(env, payload, settings.jwt_secret)
+        headers[settings.jwt_header] = "Bearer " + jwt_utils.encode_payload(env, {"payload": payload}, settings.jwt_secret)
+
+    response = http_utils.post(env, f"{settings.public_url}docbuilder", json=payload, headers=headers)
+    response.raise_for_status()
+    response_json = response.json()
+
+    if response_json.get("error"):
+        raise DocbuilderError(response_json.get("error"))
+
+    return response_json
+
+
+def run(env, script_url):
+    # a synchronous build holds a Document Server slot until the result is ready
+    with admission_utils.admit(env, "docbuilder"):
+        response_json = post(env, {"async": False, "url": script_url})
+    return response_json.get("urls") or {}
+
+
+def submit(env, script_url):
+    # returns the job key, the result is fetched later with poll
+    response_json = post(env, {"async": True, "url": script_url})
+    return response_json.get("key")
+
+
+def poll(env, key):
+    # the result urls are only set once "end" is true
+    response_json = post(env, {"async": True, "key": key})
+    return bool(response_json.get("end")), response_json.get("urls") or {}
+
+
+def get_form_keys(env, attachment_id, oo_security_token):
+    odoo_url = config_utils.get_base_or_odoo_url(env)
+    keys_callback_url = f"{odoo_url}onlyoffice/template/callback/get_keys?attachment_id={attachment_id}&oo_security_token={oo_security_token}"
+
+    urls = run(env, keys_callback_url)
+
+    first_url = next(iter(urls.values()), None)
+    if not first_url:
+        return []
+
+    response = http_utils.get(env, first_url)
+    response.raise_for_status()
+
+    response_content = codecs.decode(response.content, "utf-8-sig")
+    return sorted(json.loads(response_content))
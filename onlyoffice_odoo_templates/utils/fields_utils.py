@@ -0,0 +1,421 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import functools
+import hashlib
+import json
+import logging
+import re
+import tempfile
+
+from odoo.tools import DEFAULT_SERVER_DATE_FORMAT, DEFAULT_SERVER_DATETIME_FORMAT
+
+from odoo.addons.onlyoffice_odoo.utils import stream_utils
+
+_logger = logging.getLogger(__name__)
+
+RELATIONAL_TYPES = ("one2many", "many2many", "many2one")
+# markup and structured values have no plain text form, the template editor does not offer these fields either
+SKIPPED_TYPES = ("html", "json")
+ROWS_BATCH_SIZE = 500
+PAGE_SEPARATORS = (",", ":")
+
+
+class ReadPlan:
+    # fields to read on one model level and the relations to follow from it, in template key order
+    __slots__ = ("model_name", "entries", "read_fields")
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.entries = []
+        self.read_fields = []
+
+
+class PlanEntry:
+    __slots__ = ("name", "type", "plan", "selection", "currency_field")
+
+    def __init__(self, name, type, plan=None, selection=None, currency_field=None):
+        self.name = name
+        self.type = type
+        self.plan = plan
+        self.selection = selection
+        self.currency_field = currency_field
+
+
+def convert_keys(input_list):
+    output_dict = {}
+    for item in input_list:
+        if " " in item:
+            keys = item.split(" ")
+            current_dict = output_dict
+            for key in keys[:-1]:
+                current_dict = current_dict.setdefault(key, {})
+            current_dict[keys[-1]] = None
+        else:
+            output_dict[item] = None
+
+    def dict_to_list(input_dict):
+        output_list = []
+        for key, value in input_dict.items():
+            if isinstance(value, dict):
+                output_list.append({key: dict_to_list(value)})
+            else:
+                output_list.append(key)
+        return output_list
+
+    return dict_to_list(output_dict)
+
+
+def compile_plan(model, keys):
+    plan = ReadPlan(model._name)
+
+    for key in keys:
+        if isinstance(key, dict):
+            field_name = list(key.keys())[0]
+            field = model._fields.get(field_name)
+            if not field or field.type not in RELATIONAL_TYPES:
+                continue
+            entry = PlanEntry(field_name, field.type, plan=compile_plan(model.env[field.comodel_name], key[field_name]))
+        else:
+            field = model._fields.get(key)
+            if not field or field.type in SKIPPED_TYPES:
+                continue
+            selection = dict(field.selection) if field.type == "selection" and isinstance(field.selection, list) else None
+            currency_field = field.currency_field if field.type == "monetary" else None
+            entry = PlanEntry(key, field.type, selection=selection, currency_field=currency_field)
+
+        plan.entries.append(entry)
+        if entry.name not in plan.read_fields:
+            plan.read_fields.append(entry.name)
+
+    return plan
+
+
+@functools.lru_cache(maxsize=64)
+def get_formatters(date_format, time_format):
+    date_format_to_use = date_format or DEFAULT_SERVER_DATE_FORMAT
+    if date_format and time_format:
+        datetime_format_to_use = f"{date_format} {time_format}"
+    else:
+        datetime_format_to_use = DEFAULT_SERVER_DATETIME_FORMAT
+
+    def format_str(entry, record, data):
+        return str(data)
+
+    def format_monetary(entry, record, data):
+        data = "{:,.2f}".format(float(data))
+        if entry.currency_field:
+            currency = record[entry.currency_field].name
+            return f"{data} {currency}" if currency else str(data)
+        return str(data)
+
+    def format_date(entry, record, data):
+        return str(data.strftime(date_format_to_use))
+
+    def format_datetime(entry, record, data):
+        return str(data.strftime(datetime_format_to_use))
+
+    def format_selection(entry, record, data):
+        if entry.selection is not None:
+            return str(entry.selection.get(data))
+        return str(data)
+
+    return {
+        "float": format_str,
+        "integer": format_str,
+        "char": format_str,
+        "text": format_str,
+        "monetary": format_monetary,
+        "date": format_date,
+        "datetime": format_datetime,
+        "selection": format_selection,
+    }
+
+
+def format_value(entry, record, data, formatters):
+    if entry.type == "boolean":
+        return str(data).lower()
+    if isinstance(data, tuple):
+        return str(data[1])
+    if entry.type == "binary" and isinstance(data, bytes):
+        img = re.search(r"'(.*?)'", str(data))
+        return img.group(1) if img else None
+    if data:
+        formatter = formatters.get(entry.type)
+        if formatter:
+            return formatter(entry, record, data)
+    return None
+
+
+def read_rows(records, field_names):
+    try:
+        return records.read(field_names)
+    except Exception as e:
+        _logger.debug("Batched read on %s failed, reading records one by one: %s", records._name, e)
+
+    # keeps the former per field behaviour: an unreadable field or record is skipped
+    rows = []
+    for record in records:
+        row = {"id": record.id}
+        for field_name in field_names:
+            try:
+                row[field_name] = record.read([field_name])[0][field_name]
+            except Exception as e:
+                _logger.debug("Failed to read %s on %s: %s", field_name, record, e)
+        rows.append(row)
+    return rows
+
+
+def execute_plan(plan, records, formatters, row_limit=None):
+    if not records or not plan.read_fields:
+        return {record.id: {} for record in records}
+
+    records_by_id = {record.id: record for record in records}
+    rows = read_rows(records, plan.read_fields)
+
+    # only the first rows of a large one2many or many2many are read and filled
+    if row_limit:
+        for row in rows:
+            for entry in plan.entries:
+                if entry.plan and isinstance(row.get(entry.name), list):
+                    row[entry.name] = row[entry.name][:row_limit]
+
+    # one read per relation over the related ids of all records of this level
+    related_results = {}
+    for entry in plan.entries:
+        if not entry.plan or entry.name in related_results:
+            continue
+        related_ids = []
+        for row in rows:
+            value = row.get(entry.name)
+            if isinstance(value, tuple):
+                related_ids.append(value[0])
+            elif isinstance(value, list):
+                related_ids.extend(value)
+        related_records = records.env[entry.plan.model_name].browse(list(dict.fromkeys(related_ids))).exists()
+        related_results[entry.name] = execute_plan(entry.plan, related_records, formatters, row_limit)
+
+    results = {}
+    for row in rows:
+        record = records_by_id[row["id"]]
+        result = {}
+        for entry in plan.entries:
+            if entry.name not in row:
+                continue
+            data = row[entry.name]
+            try:
+                if entry.plan:
+                    if not data:
+                        continue
+                    sub_results = related_results[entry.name]
+                    if entry.type == "many2one" and isinstance(data, tuple):
+                        related_data = sub_results.get(data[0])
+                    else:
+                        related_data = [sub_results[related_id] for related_id in data if sub_results.get(related_id)]
+                    if related_data:
+                        result[entry.name] = related_data
+                else:
+                    value = format_value(entry, record, data, formatters)
+                    if value is not None:
+                        result[entry.name] = value
+            except Exception as e:
+                _logger.warning("Failed to get value of %s on %s: %s", entry.name, record, e)
+                continue
+        results[record.id] = result
+
+    return results
+
+
+def get_records_fields(records, keys, lang, row_limit=None):
+    plan = compile_plan(records, convert_keys(keys))
+    formatters = get_formatters(lang.date_format, lang.time_format)
+    return execute_plan(plan, records, formatters, row_limit)
+
+
+def iter_records_fields_pages(records, keys, lang, page_size, row_limit=None):
+    # the caller discards the pages of every record once they are stored
+    plan = compile_plan(records, convert_keys(keys))
+    formatters = get_formatters(lang.date_format, lang.time_format)
+    for record, items in iter_records_fields(plan, records, formatters, row_limit):
+        yield record, write_fields_pages(items, page_size)
+
+
+def iter_records_fields(plan, records, formatters, row_limit=None, batch_size=ROWS_BATCH_SIZE):
+    # yields every record with a generator of its (key, value, is_row) items, one2many and many2many rows
+    # are read batch by batch while the items are consumed, so a large record is never held in memory
+    if not records:
+        return
+
+    records_by_id = {record.id: record for record in records}
+    rows = read_rows(records, plan.read_fields) if plan.read_fields else [{"id": record.id} for record in records]
+
+    # many2one values are single rows, they are read once for all records like in execute_plan
+    many2one_results = {}
+    for entry in plan.entries:
+        if entry.type != "many2one" or not entry.plan or entry.name in many2one_results:
+            continue
+        related_ids = [row[entry.name][0] for row in rows if isinstance(row.get(entry.name), tuple)]
+        related_records = records.env[entry.plan.model_name].browse(list(dict.fromkeys(related_ids))).exists()
+        many2one_results[entry.name] = execute_plan(entry.plan, related_records, formatters, row_limit)
+
+    for row in rows:
+        record = records_by_id[row["id"]]
+        yield record, iter_row_fields(plan, record, row, many2one_results, formatters, row_limit, batch_size)
+
+
+def iter_row_fields(plan, record, row, many2one_results, formatters, row_limit, batch_size):
+    for entry in plan.entries:
+        if entry.name not in row:
+            continue
+        data = row[entry.name]
+        try:
+            if not entry.plan:
+                value = format_value(entry, record, data, formatters)
+                if value is not None:
+                    yield entry.name, value, False
+            elif not data:
+                continue
+            elif entry.type == "many2one":
+                related_data = many2one_results[entry.name].get(data[0]) if isinstance(data, tuple) else None
+                if related_data:
+                    yield entry.name, related_data, False
+            else:
+                related_ids = data[:row_limit] if row_limit else data
+                for start in range(0, len(related_ids), batch_size):
+                    batch_ids = related_ids[start:start + batch_size]
+                    related_records = record.env[entry.plan.model_name].browse(batch_ids).exists()
+                    sub_results = execute_plan(entry.plan, related_records, formatters, row_limit)
+                    for related_id in batch_ids:
+                        if sub_results.get(related_id):
+                            yield entry.name, sub_results[related_id], True
+        except Exception as e:
+            _logger.warning("Failed to get value of %s on %s: %s", entry.name, record, e)
+            continue
+
+
+class FieldsPages:
+    # the data of one record as pages of at most page_size bytes, every page is a JSON object on its own
+    # and the rows of a relation are spread over pages. The first page is kept in memory, the next ones
+    # are written to a spooled file, so a record that fits in one page is inlined and never hits the disk
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.parts = []
+        self.size = 0
+        self.list_key = None
+
+        self.first_page = None
+        self.file = None
+        self.offsets = []
+        self.sha = hashlib.sha1()
+        self.file_size = 0
+
+    def add(self, key, value, is_row=False):
+        text = json.dumps(value, separators=PAGE_SEPARATORS)
+        piece = self.get_piece(key, text, is_row)
+        # 3 bytes for the braces and the bracket of an open row list
+        if self.parts and self.size + len(piece) + 3 > self.page_size:
+            self.flush_page()
+            piece = self.get_piece(key, text, is_row)
+
+        self.parts.append(piece)
+        self.size += len(piece)
+        self.list_key = key if is_row else None
+
+    def get_piece(self, key, text, is_row):
+        if is_row and self.list_key == key:
+            return "," + text
+        prefix = ("]" if self.list_key else "") + ("," if self.parts else "") + json.dumps(key) + ":"
+        return prefix + ("[" + text if is_row else text)
+
+    def flush_page(self):
+        page = "{" + "".join(self.parts) + ("]" if self.list_key else "") + "}"
+        self.parts = []
+        self.size = 0
+        self.list_key = None
+
+        if self.first_page is None:
+            self.first_page = page
+            return
+
+        if self.file is None:
+            self.file = tempfile.SpooledTemporaryFile(max_size=stream_utils.SPOOL_MAX_SIZE)
+            self.write_page(self.first_page)
+        self.write_page(page)
+
+    def write_page(self, page):
+        # pages are plain ascii, so their length is their size in bytes
+        data = page.encode() + b"\n"
+        self.offsets.append((self.file_size, len(page)))
+        self.sha.update(data)
+        self.file.write(data)
+        self.file_size += len(data)
+
+    def close(self):
+        if self.parts or self.first_page is None:
+            self.flush_page()
+        if self.file is not None:
+            self.file.seek(0)
+
+    @property
+    def inline(self):
+        return self.first_page if self.file is None else None
+
+    @property
+    def checksum(self):
+        return self.sha.hexdigest()
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def write_fields_pages(items, page_size):
+    pages = FieldsPages(page_size)
+    try:
+        for key, value, is_row in items:
+            pages.add(key, value, is_row)
+        pages.close()
+    except Exception:
+        pages.discard()
+        raise
+    return pages
+
+
+def collect_versions(plan, records):
+    # write_date of every record the plan reads from, per record of this level
+    relation_entries = []
+    for entry in plan.entries:
+        if entry.plan and entry.name not in [relation.name for relation in relation_entries]:
+            relation_entries.append(entry)
+
+    rows = read_rows(records, ["write_date"] + [entry.name for entry in relation_entries])
+
+    related_versions = {}
+    for entry in relation_entries:
+        related_ids = []
+        for row in rows:
+            value = row.get(entry.name)
+            if isinstance(value, tuple):
+                related_ids.append(value[0])
+            elif isinstance(value, list):
+                related_ids.extend(value)
+        related_records = records.env[entry.plan.model_name].browse(list(dict.fromkeys(related_ids))).exists()
+        related_versions[entry.name] = collect_versions(entry.plan, related_records) if related_records else {}
+
+    versions = {}
+    for row in rows:
+        version = [f"{plan.model_name},{row['id']},{row.get('write_date')}"]
+        for entry in relation_entries:
+            value = row.get(entry.name)
+            related_ids = [value[0]] if isinstance(value, tuple) else (value or [])
+            for related_id in related_ids:
+                version.extend(related_versions[entry.name].get(related_id, []))
+        versions[row["id"]] = version
+
+    return versions
+
+
+def get_records_versions(records, keys):
+    plan = compile_plan(records, convert_keys(keys))
+    return collect_versions(plan, records)
@@ -1,38 +1,239 @@
 # TODO: add convert docx to pdf
 
-def is_pdf_form(text):
-    if not text:
+import re
+
+from io import BytesIO
+
+# odoo.tools.pdf runs on PyPDF2 1.x and 2.x, this module uses the camelCase API of those versions
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+from PyPDF2.generic import (
+    ArrayObject,
+    BooleanObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    FloatObject,
+    NameObject,
+    TextStringObject,
+)
+
+HEAD_SIZE = 16 * 1024
+
+FORM_MARKER = b"%\xCD\xCA\xD2\xA9\x0D"
+FIRST_OBJECT = b"1 0 obj\x0A<<\x0A"
+STREAM = b"stream\x0D\x0A"
+SIGNATURE = b"ONLYOFFICEFORM"
+
+TEXT_FIELD = "/Tx"
+
+# appearance streams are drawn with the standard Helvetica font, its encoding covers cp1252 only
+APPEARANCE_FONT = "/Helv"
+APPEARANCE_ENCODING = "cp1252"
+FONT_SIZE = 10
+MAX_AUTO_FONT_SIZE = 12
+MIN_AUTO_FONT_SIZE = 4
+PADDING = 2
+LEADING = 1.15
+
+
+class UnsupportedTextError(ValueError):
+    pass
+
+
+def is_pdf_form(data):
+    # data is bytes, a memoryview or a binary file object, only its head is read
+    if not data:
         return False
-    
-    index_first = text.find(b'%\xCD\xCA\xD2\xA9\x0D')
+
+    if hasattr(data, "read"):
+        head = data.read(HEAD_SIZE)
+    else:
+        head = bytes(memoryview(data)[:HEAD_SIZE])
+
+    return check_head(head)
+
+
+def is_pdf_form_attachment(attachment):
+    # files in the filestore are opened directly, only database stored content is loaded
+    if attachment.store_fname:
+        with open(attachment._full_path(attachment.store_fname), "rb") as file:
+            return is_pdf_form(file)
+
+    return is_pdf_form(attachment.raw)
+
+
+def check_head(head):
+    # offsets are passed to find and startswith, so the head is never sliced
+    index_first = head.find(FORM_MARKER)
     if index_first == -1:
         return False
-    
-    p_first = text[index_first + 6:]
 
-    if not p_first.startswith(b'1 0 obj\x0A<<\x0A'):
+    start = index_first + len(FORM_MARKER)
+    if not head.startswith(FIRST_OBJECT, start):
         return False
-    
-    p_first = p_first[11:]
 
-    signature = b'ONLYOFFICEFORM'
-    index_stream = p_first.find(b'stream\x0D\x0A')
-    index_meta = p_first.find(signature)
+    start += len(FIRST_OBJECT)
+    index_stream = head.find(STREAM, start)
+    index_meta = head.find(SIGNATURE, start)
 
     if index_stream == -1 or index_meta == -1 or index_stream < index_meta:
         return False
-    
-    p_meta = p_first[index_meta:]
-    p_meta = p_meta[len(signature) + 3:]
 
-    index_meta_last = p_meta.find(b' ')
+    index_meta_last = head.find(b" ", index_meta + len(SIGNATURE) + 3)
     if index_meta_last == -1:
         return False
-    
-    p_meta = p_meta[index_meta_last + 1:]
 
-    index_meta_last = p_meta.find(b' ')
+    index_meta_last = head.find(b" ", index_meta_last + 1)
     if index_meta_last == -1:
         return False
-    
-    return True
\ No newline at end of file
+
+    return True
+
+
+def iter_form_fields(fields, parent_name=None, parent_type=None):
+    # yields (name, type, field, widgets) for every terminal field, the type is inherited from the parent
+    for field in fields:
+        field = field.getObject()
+        name = field.get("/T")
+        if parent_name is not None:
+            name = f"{parent_name}.{name}" if name is not None else parent_name
+        field_type = field.get("/FT", parent_type)
+
+        kids = [kid.getObject() for kid in field.get("/Kids", [])]
+        if any("/T" in kid for kid in kids):
+            yield from iter_form_fields(field["/Kids"], name, field_type)
+        else:
+            yield name, field_type, field, kids or [field]
+
+
+def get_acro_form(reader):
+    acro_form = reader.trailer["/Root"].get("/AcroForm")
+    return acro_form.getObject() if acro_form else None
+
+
+def get_root_fields(acro_form):
+    # ONLYOFFICE lists the widgets of a field with several widgets instead of the field itself
+    fields = []
+    seen = set()
+    for field in acro_form.get("/Fields", []):
+        field = field.getObject()
+        while "/T" not in field and "/Parent" in field:
+            field = field["/Parent"].getObject()
+        if id(field) not in seen:
+            seen.add(id(field))
+            fields.append(field)
+    return fields
+
+
+def get_form_field_types(data):
+    reader = PdfFileReader(BytesIO(data), strict=False)
+    acro_form = get_acro_form(reader)
+    if not acro_form:
+        return {}
+
+    return {name: field_type for name, field_type, field, widgets in iter_form_fields(get_root_fields(acro_form))}
+
+
+def to_text_value(value):
+    # same as fillTextForm in fill_template.docbuilder, an empty Odoo value is false
+    if value is None:
+        return ""
+    value = str(value)
+    return " " if value in ("false", "undefined") else value
+
+
+def escape_text(value):
+    try:
+        text = value.encode(APPEARANCE_ENCODING)
+    except UnicodeEncodeError:
+        raise UnsupportedTextError("%r cannot be drawn with the standard PDF fonts" % value)
+    return text.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def get_font_size(field, height):
+    # the size of /DA is used when it is set, a size of 0 means the text is fitted to the field
+    match = re.search(r"(\d+(?:\.\d+)?)\s+Tf", str(field.get("/DA", "")))
+    size = float(match.group(1)) if match else FONT_SIZE
+    if size:
+        return size
+    return max(min(MAX_AUTO_FONT_SIZE, (height - 2 * PADDING) * 0.8), MIN_AUTO_FONT_SIZE)
+
+
+def build_appearance(field, widget, value):
+    # the filled text is drawn into the widget, so it still shows once merge_pdf has dropped the AcroForm
+    llx, lly, urx, ury = [float(coordinate) for coordinate in widget["/Rect"]]
+    width, height = abs(urx - llx), abs(ury - lly)
+    size = get_font_size(field, height)
+
+    lines = [escape_text(line) for line in value.splitlines()] or [b""]
+    # a single line is centered vertically, several lines start at the top of the field
+    if len(lines) == 1:
+        baseline = (height - size * 0.7) / 2
+    else:
+        baseline = height - PADDING - size
+
+    content = [
+        b"/Tx BMC q",
+        b"%.2f %.2f %.2f %.2f re W n" % (PADDING, PADDING, max(width - 2 * PADDING, 0), max(height - 2 * PADDING, 0)),
+        b"BT %s %.2f Tf %.2f TL 0 g %.2f %.2f Td" % (APPEARANCE_FONT.encode(), size, size * LEADING, PADDING, baseline),
+    ]
+    for index, line in enumerate(lines):
+        content.append(b"(%s) Tj" % line if index == 0 else b"T* (%s) Tj" % line)
+    content.append(b"ET Q EMC")
+
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    })
+    stream = DecodedStreamObject()
+    stream.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)]),
+        NameObject("/Resources"): DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject(APPEARANCE_FONT): font}),
+        }),
+    })
+    stream.setData(b"\n".join(content))
+    return DictionaryObject({NameObject("/N"): stream})
+
+
+def fill_form(data, values):
+    # ONLYOFFICE forms name their fields after the form keys, values that the standard fonts
+    # cannot draw raise UnsupportedTextError and are left to docbuilder
+    reader = PdfFileReader(BytesIO(data), strict=False)
+    acro_form = get_acro_form(reader)
+    if not acro_form:
+        return data
+
+    for name, field_type, field, widgets in iter_form_fields(get_root_fields(acro_form)):
+        if field_type != TEXT_FIELD or name not in values:
+            continue
+
+        field[NameObject("/V")] = TextStringObject(values[name])
+        for widget in widgets:
+            if "/Rect" in widget:
+                widget[NameObject("/AP")] = build_appearance(field, widget, values[name])
+            else:
+                widget.pop("/AP", None)
+
+    # viewers that keep the AcroForm may still redraw the fields with the form fonts
+    acro_form[NameObject("/NeedAppearances")] = BooleanObject(True)
+
+    writer = PdfFileWriter()
+    writer.cloneReaderDocumentRoot(reader)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def merge_pdf_files(files, output):
+    # like odoo.tools.pdf.merge_pdf, with the documents read from and written to files instead of bytes
+    writer = PdfFileWriter()
+    for file in files:
+        reader = PdfFileReader(file, strict=False)
+        for page in range(reader.getNumPages()):
+            writer.addPage(reader.getPage(page))
+    writer.write(output)
\ No newline at end of file
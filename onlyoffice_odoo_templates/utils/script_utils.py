@@ -0,0 +1,67 @@
+#
+# (c) Copyright Ascensio System SIA 2024
+#
+
+import functools
+import json
+
+from odoo.tools import file_open
+
+SCRIPTS_PATH = "onlyoffice_odoo_templates/controllers/"
+
+# per job parts are substituted into these wrappers, everything else is static
+OPEN_FILE = '\nbuilder.OpenFile("%s");\n'
+CLOSE_FILE = "\nbuilder.CloseFile();\n"
+SAVE_FILE = '\nbuilder.SaveFile("pdf", "%s");\nbuilder.CloseFile();\n'
+INLINE_FIELDS = "var fields = %s;\n"
+RESET_FIELDS = 'GlobalVariable["fields"] = "";\n'
+# the script context is reset between files, so the fill script is kept as text in GlobalVariable
+# once and evaluated for every document instead of being repeated for each of them
+STORE_FILL = 'GlobalVariable["fill_template"] = %s;\n'
+RUN_FILL = 'eval(GlobalVariable["fill_template"]);\n'
+
+
+@functools.lru_cache(maxsize=None)
+def get_script(name):
+    # the scripts are shipped with the module, they are read once per worker
+    with file_open(f"{SCRIPTS_PATH}{name}.docbuilder", "r") as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=None)
+def get_store_fill_script():
+    return STORE_FILL % json.dumps(get_script("fill_template"))
+
+
+def get_keys_script(url):
+    return "".join((OPEN_FILE % url, get_script("get_keys")))
+
+
+def get_fields_pages_script(page_urls):
+    read_script = get_script("read_fields_page")
+
+    parts = []
+    for index, page_url in enumerate(page_urls):
+        parts.append(OPEN_FILE % page_url)
+        if index == 0:
+            parts.append(RESET_FIELDS)
+        parts.append(read_script)
+        parts.append(CLOSE_FILE)
+    return "".join(parts)
+
+
+def get_fill_script(url, documents):
+    # documents are (filename, fields_json, pages_script) tuples, fields_json is None when the pages are read
+    merge_script = get_script("merge_fields_pages")
+
+    parts = []
+    for index, (filename, fields_json, pages_script) in enumerate(documents):
+        if fields_json is None:
+            parts.append(pages_script)
+        parts.append(OPEN_FILE % url)
+        if index == 0:
+            parts.append(get_store_fill_script())
+        parts.append(INLINE_FIELDS % fields_json if fields_json is not None else merge_script)
+        parts.append(RUN_FILL)
+        parts.append(SAVE_FILE % filename)
+    return "".join(parts)